@@ -1,4 +1,3 @@
-import io
 import os
 from datetime import datetime
 
@@ -8,7 +7,13 @@ import pytz
 import plotly.graph_objects as go
 
 import dash_bootstrap_components as dbc
-from dash import Dash, dcc, html, Input, Output, State, callback_context, no_update
+from dash import Dash, dcc, html, Input, Output, State, Patch, callback_context, no_update
+
+from cache import LRUCache
+from clustering import cluster_labels
+from dataset_store import DatasetStore
+from downsample import DEFAULT_POINT_BUDGET, camera_view, lod_rows
+from histogram import HistogramIndex
 
 # === 1. Initialize Dash App ===
 app = Dash(
@@ -18,6 +23,21 @@ app = Dash(
 )
 server = app.server
 
+# Loaded datasets live server-side; the df-store only carries their key
+datasets = DatasetStore(
+    max_bytes=int(os.environ.get("DASHBOARD_CACHE_BYTES", 2 * 1024 ** 3)),
+    cache_dir=os.environ.get("DASHBOARD_COLUMNAR_DIR")
+)
+# Prepared plot arrays keyed by (dataset key, columns, filters, units, color), so frame ticks reuse them
+points_cache = LRUCache(max_bytes=int(os.environ.get("DASHBOARD_POINTS_CACHE_BYTES", 256 * 1024 ** 2)))
+# Cluster labels keyed by (dataset key, columns, filters, k)
+cluster_cache = LRUCache(max_bytes=int(os.environ.get("DASHBOARD_CLUSTER_CACHE_BYTES", 256 * 1024 ** 2)))
+# Downsampled row selections keyed like the clusters, plus color, budget and camera view
+lod_cache = LRUCache(max_bytes=int(os.environ.get("DASHBOARD_LOD_CACHE_BYTES", 128 * 1024 ** 2)))
+# Histogram indexes per (dataset, field, time column) and counts per time window
+histogram_cache = LRUCache(max_bytes=int(os.environ.get("DASHBOARD_HISTOGRAM_CACHE_BYTES", 128 * 1024 ** 2)))
+POINT_BUDGET = int(os.environ.get("DASHBOARD_POINT_BUDGET", DEFAULT_POINT_BUDGET))
+
 # === 2. App Layout ===
 sidebar = dbc.Card([
     html.H5("Controls", className="card-title"),
@@ -122,6 +142,11 @@ dcc.Dropdown(
         marks={0.1:"0.1",0.5:"0.5",1:"1"},
         tooltip={"always_visible":True,"placement":"bottom"}
     ),
+    dbc.Label("Point Budget"),
+    dbc.Input(id="point-budget", type="number", min=1000, step=1000, value=POINT_BUDGET),
+    dcc.Store(id="lod-view"),
+    # frame the 3D figure's trail currently ends at, so ticks only send what changed
+    dcc.Store(id="trail-state"),
     html.Hr(),
     # ─── Clustering Controls ───────────────────────────────────
     html.Hr(),
@@ -214,12 +239,11 @@ def load_file(n, path):
     if not os.path.exists(path):
         return {}, dbc.Alert(f"File not found: {path}", color="danger")
     try:
-        df = (pd.read_excel(path) if path.lower().endswith((".xls","xlsx"))
-              else pd.read_csv(path))
+        key, dataset = datasets.load(path)
     except Exception as e:
         return {}, dbc.Alert(f"Error reading file: {e}", color="danger")
-    return df.to_json(date_format="iso", orient="split"), \
-           dbc.Alert(f"Loaded {os.path.basename(path)} ({len(df)} rows)", color="success")
+    return {"key": key}, \
+           dbc.Alert(f"Loaded {os.path.basename(path)} ({dataset.num_rows} rows)", color="success")
 
 # === 4. Populate dropdowns ===
 @app.callback(
@@ -231,12 +255,13 @@ def load_file(n, path):
     Output("extra-stats-cols", "options"),
     Input("df-store","data")
 )
-def set_columns(json_data):
-    if not json_data:
+def set_columns(store_data):
+    # schema only; no column data is read here
+    dataset = datasets.dataset(store_data)
+    if dataset is None:
         empty = []
-        return empty, empty, empty, [{"label":"None","value":"None"}], empty
-    df = pd.read_json(io.StringIO(json_data), orient="split")
-    opts = [{"label":c,"value":c} for c in df.columns]
+        return empty, empty, empty, [{"label":"None","value":"None"}], empty, empty
+    opts = [{"label":c,"value":c} for c in dataset.columns]
     time_opts = [{"label":"None","value":"None"}] + opts
     return opts, opts, opts, time_opts, opts, opts
 
@@ -245,11 +270,11 @@ def set_columns(json_data):
     Output("frame-slider","max"),
     Input("df-store","data")
 )
-def update_slider_max(json_data):
-    if not json_data:
+def update_slider_max(store_data):
+    dataset = datasets.dataset(store_data)
+    if dataset is None:
         return 0
-    df = pd.read_json(io.StringIO(json_data), orient="split")
-    return max(len(df)-1, 0)
+    return max(dataset.num_rows-1, 0)
 
 # === 6. Interval speed ===
 @app.callback(
@@ -280,9 +305,194 @@ def auto_advance(n, current, mx):
     return 0 if mx<=0 else (current + 1) % (mx+1)
 
 # === 9. Draw/update plots & stats ===
+def window_rows(store_data, tcol, start_date, end_date):
+    """Rows whose date in tcol lies in the picker range (a slice or positions), or None for all rows."""
+    if tcol == "None" or not start_date or not end_date:
+        return None
+    index = datasets.time_index(store_data, tcol)
+    if index is None:
+        return None
+    return index.rows(start_date, end_date)
+
+def prepare_points(
+    df, store_data, xcol, ycol, zcol, tcol, latlon, xtype, ytype, unit,
+    color_by, cluster_toggle, n_clusters, start_date, end_date
+):
+    """
+    Filters the DataFrame and derives the plotted coordinates and colors.
+
+    Memoized per dataset and settings, so a frame tick only looks the arrays
+    up. "source" maps each plotted point back to its row of df: None for
+    all rows, a slice when the time column is sorted, else row positions.
+    """
+    # identifies these x/y/z arrays for the cluster and LOD caches
+    points_key = (store_data["key"], xcol, ycol, zcol, tcol, start_date, end_date,
+                  "scale" in latlon, xtype, ytype)
+    clustered = "on" in cluster_toggle and n_clusters and n_clusters > 1
+    cache_key = points_key + (unit, color_by, int(n_clusters) if clustered else None)
+    p = points_cache.get(cache_key)
+    if p is not None:
+        return p
+
+    # time‑window filter; a slice of a sorted column selects a view, not a copy
+    source = window_rows(store_data, tcol, start_date, end_date)
+    if source is not None:
+        df = df.iloc[source]
+
+    # extract coordinates
+    x = pd.to_numeric(df[xcol], errors="coerce").values
+    y = pd.to_numeric(df[ycol], errors="coerce").values
+    z = -pd.to_numeric(df[zcol], errors="coerce").values
+
+    # lat/lon scaling
+    if "scale" in latlon and y.min() >= -90 and y.max() <= 90:
+        x = x * np.cos(np.deg2rad(np.nanmean(y)))
+
+    # angular conversion
+    def conv(arr, typ):
+        if typ == "Angular (deg)": return np.deg2rad(arr)
+        if typ == "Angular (gon)": return arr * (np.pi/200)
+        return arr
+    x, y = conv(x, xtype), conv(y, ytype)
+
+    # depth conversion
+    depth_m = -z
+    if unit == "imperial": depth_disp = depth_m * 3.28084; du = "ft"
+    else: depth_disp = depth_m; du = "m"
+
+    # clustering, memoized so frame or styling changes never recluster
+    labels = None
+    if clustered:
+        k = int(n_clusters)
+        labels_key = points_key + (k,)
+        labels = cluster_cache.get(labels_key)
+        if labels is None:
+            labels = cluster_labels(np.vstack((x, y, z)).T, k)
+            cluster_cache.put(labels_key, labels, labels.nbytes)
+        color_vals = labels
+        colorbar_title = f"Cluster ID ({k})"
+    else:
+        # fallback to existing color logic
+        if color_by and color_by in df.columns:
+            color_vals = pd.to_numeric(df[color_by], errors="coerce").values
+            colorbar_title = color_by
+        else:
+            color_vals = z
+            colorbar_title = zcol
+
+    p = dict(source=source, x=x, y=y, z=z, depth_disp=depth_disp, du=du,
+             color_vals=color_vals, colorbar_title=colorbar_title,
+             labels=labels, points_key=points_key)
+    arrays = [source, x, y, z, depth_disp, color_vals]
+    points_cache.put(cache_key, p, sum(a.nbytes for a in arrays if isinstance(a, np.ndarray)))
+    return p
+
+def sample_rows(p, budget, view):
+    """Rows to draw within the point budget, refined inside the camera view when zoomed in."""
+    view_key = (view["tier"], tuple(view["center"])) if view else None
+    cache_key = p["points_key"] + (p["colorbar_title"], budget, view_key)
+    rows = lod_cache.get(cache_key)
+    if rows is None:
+        rows = lod_rows(np.vstack((p["x"], p["y"], p["z"])).T, budget, view,
+                        labels=p["labels"], values=p["color_vals"])
+        lod_cache.put(cache_key, rows, rows.nbytes)
+    return rows
+
+def build_stats(df, p, idx, xcol, ycol, tcol, extra_cols):
+    """Stats panel for the current frame."""
+    x, y = p["x"], p["y"]
+    source = p["source"]
+    if source is None:
+        row = idx
+    elif isinstance(source, slice):
+        row = source.start + idx
+    else:
+        row = source[idx]
+    raw_time = df[tcol].iloc[row] if tcol != "None" else None
+    try:
+        human_time = (
+            datetime.fromtimestamp(raw_time, tz=pytz.UTC)
+            .strftime("%Y-%m-%d %H:%M:%S.%f")
+            if pd.api.types.is_numeric_dtype(df[tcol].dtype)
+            else str(raw_time)
+        )
+    except:
+        human_time = str(raw_time)
+
+    stat_items = [
+        html.Div(f"Frame: {idx}"),
+        html.Div(f"{xcol}: {x[idx]:.2f}"),
+        html.Div(f"{ycol}: {y[idx]:.2f}"),
+        html.Div(f"Depth: {p['depth_disp'][idx]:.1f} {p['du']}"),
+        html.Div(f"Time: {raw_time}"),
+        html.Div(f"Converted: {human_time}"),
+    ]
+
+    # Add extra selected columns
+    if extra_cols:
+        for col in extra_cols:
+            try:
+                val = df[col].iloc[row]
+                stat_items.append(html.Div(f"{col}: {val}"))
+            except:
+                stat_items.append(html.Div(f"{col}: (unavailable)"))
+
+    return dbc.Alert(stat_items, color="info")
+
+def trail_rows(rows, idx):
+    # the trail follows the sampled rows up to the current frame
+    return np.append(rows[:np.searchsorted(rows, idx)], idx)
+
+def trail_trace(p, rows, idx, palette, marker_size):
+    trail = trail_rows(rows, idx)
+    # plain lists, so frame ticks can extend them in place with a Patch
+    x, y, z = p["x"][trail].tolist(), p["y"][trail].tolist(), p["z"][trail].tolist()
+    return go.Scatter3d(
+        x=x, y=y, z=z, mode="lines",
+        line=dict(color=p["color_vals"][trail].tolist(), colorscale=palette, width=marker_size/2),
+        name="Trail"
+    )
+
+def patch_trail(fig_patch, trace_i, p, rows, previous, idx):
+    """
+    Moves the trail's end from frame previous to idx in fig_patch.
+
+    Going forward, only the sampled rows passed since the last tick are
+    appended, so a tick's payload doesn't grow with the track. Going back
+    (or wrapping around) the trail is replaced.
+    """
+    trail = fig_patch["data"][trace_i]
+    targets = [(trail, "x", p["x"]), (trail, "y", p["y"]), (trail, "z", p["z"]),
+               (trail["line"], "color", p["color_vals"])]
+    if previous is None or idx < previous:
+        replaced = trail_rows(rows, idx)
+        for parent, attr, values in targets:
+            parent[attr] = values[replaced].tolist()
+        return
+
+    # the previous frame ends the trail; it stays only if it is a sampled row
+    lo = np.searchsorted(rows, previous)
+    keep_previous = lo < len(rows) and rows[lo] == previous
+    if idx == previous:
+        return
+    new = np.append(rows[lo + keep_previous:np.searchsorted(rows, idx)], idx)
+    for parent, attr, values in targets:
+        if not keep_previous:
+            del parent[attr][-1]
+        parent[attr].extend(values[new].tolist())
+
+def current_trace(p, idx, marker_size):
+    x, y, z = p["x"], p["y"], p["z"]
+    return go.Scatter3d(
+        x=[x[idx]], y=[y[idx]], z=[z[idx]], mode="markers",
+        marker=dict(size=marker_size*1.5, color="red", opacity=1.0),
+        name="Current"
+    )
+
 @app.callback(
     Output("3d-plot", "figure"),
     Output("stats-panel", "children"),
+    Output("trail-state", "data"),
     [
         Input("df-store", "data"),
         Input("x-axis", "value"),
@@ -311,87 +521,42 @@ def auto_advance(n, current, mx):
         Input("btn-side", "n_clicks"),
         Input("btn-iso", "n_clicks"),
         Input("extra-stats-cols", "value"),
+        Input("point-budget", "value"),
+        Input("lod-view", "data"),
     ],
-    State("3d-plot", "figure")
+    State("trail-state", "data"),
 )
 def update_plots(
-    json_data, xcol, ycol, zcol, tcol, latlon, xtype, ytype,
+    store_data, xcol, ycol, zcol, tcol, latlon, xtype, ytype,
     title, mode, palette, tz, dark, unit, show_cloud_vals,
     color_by, cluster_toggle, n_clusters,
     start_date, end_date, marker_size, marker_opacity,
-    idx, top, side, iso, extra_cols, old_fig
+    idx, top, side, iso, extra_cols, budget, view, trail_state
 ):
     # validate
-    if not json_data or not all([xcol, ycol, zcol]):
-        return go.Figure(), ""
-
-    # rehydrate DataFrame
-    df = pd.read_json(io.StringIO(json_data), orient="split")
-
-    # time‑window filter
-    if tcol != "None" and start_date and end_date:
-        dates = pd.to_datetime(df[tcol], unit="s", errors="coerce").dt.date
-        mask = dates.between(
-            pd.to_datetime(start_date).date(),
-            pd.to_datetime(end_date).date()
-        )
-        df = df.loc[mask].reset_index(drop=True)
-
-    # extract coordinates
-    x = pd.to_numeric(df[xcol], errors="coerce").values
-    y = pd.to_numeric(df[ycol], errors="coerce").values
-    z = -pd.to_numeric(df[zcol], errors="coerce").values
-
-    # lat/lon scaling
-    if "scale" in latlon and y.min() >= -90 and y.max() <= 90:
-        x = x * np.cos(np.deg2rad(np.nanmean(y)))
-
-    # angular conversion
-    def conv(arr, typ):
-        if typ == "Angular (deg)": return np.deg2rad(arr)
-        if typ == "Angular (gon)": return arr * (np.pi/200)
-        return arr
-    x, y = conv(x, xtype), conv(y, ytype)
+    df = datasets.frame(store_data, [xcol, ycol, zcol, tcol, color_by] + (extra_cols or []))
+    if df is None or not all([xcol, ycol, zcol]):
+        return go.Figure(), "", None
 
-    # depth conversion
-    depth_m = -z
-    if unit == "imperial": depth_disp = depth_m * 3.28084; du = "ft"
-    else: depth_disp = depth_m; du = "m"
-
-    # clustering logic (pure numpy)
-    if "on" in cluster_toggle and n_clusters and n_clusters > 1:
-        pts = np.vstack((x, y, z)).T
-        # mask invalid rows
-        valid = ~np.isnan(pts).any(axis=1)
-        labels = np.full(len(pts), np.nan)
-        pts_valid = pts[valid]
-        # simple k-means
-        def simple_kmeans(data, k, iters=10):
-            rng = np.random.RandomState(0)
-            # initialize centroids
-            centroids = data[rng.choice(len(data), size=k, replace=False)]
-            for _ in range(iters):
-                # assign clusters
-                dists = np.linalg.norm(data[:, None, :] - centroids[None, :, :], axis=2)
-                lbls = np.argmin(dists, axis=1)
-                # update centroids
-                for j in range(k):
-                    if np.any(lbls == j):
-                        centroids[j] = data[lbls == j].mean(axis=0)
-            return lbls
-        k = int(n_clusters)
-        lbls_valid = simple_kmeans(pts_valid, k)
-        labels[valid] = lbls_valid
-        color_vals = labels
-        colorbar_title = f"Cluster ID ({k})"
-    else:
-        # fallback to existing color logic
-        if color_by and color_by in df.columns:
-            color_vals = pd.to_numeric(df[color_by], errors="coerce").values
-            colorbar_title = color_by
-        else:
-            color_vals = z
-            colorbar_title = zcol
+    p = prepare_points(
+        df, store_data, xcol, ycol, zcol, tcol, latlon, xtype, ytype, unit,
+        color_by, cluster_toggle, n_clusters, start_date, end_date
+    )
+    stats = build_stats(df, p, idx, xcol, ycol, tcol, extra_cols)
+    rows = sample_rows(p, int(budget) if budget and budget > 0 else POINT_BUDGET, view)
+    x, y, z, color_vals = p["x"][rows], p["y"][rows], p["z"][rows], p["color_vals"][rows]
+
+    # fast path: a frame tick only moves the "Current" marker and the "Trail",
+    # so patch those two traces instead of resending the whole figure
+    triggered = {t["prop_id"] for t in callback_context.triggered}
+    if triggered == {"frame-slider.value"}:
+        trail_i = 1 if "show" in show_cloud_vals else 0
+        current = current_trace(p, idx, marker_size)
+        fig_patch = Patch()
+        patch_trail(fig_patch, trail_i, p, rows, (trail_state or {}).get("idx"), idx)
+        for attr in ("x", "y", "z"):
+            fig_patch["data"][trail_i + 1][attr] = current[attr]
+        return fig_patch, stats, {"idx": idx}
 
     # build traces
     traces = []
@@ -404,35 +569,27 @@ def update_plots(
                 color=color_vals,
                 colorscale=palette,
                 showscale=True,
-                colorbar=dict(title=colorbar_title, len=0.5)
+                colorbar=dict(title=p["colorbar_title"], len=0.5)
             ),
             name="All Points"
         ))
-    traces.append(go.Scatter3d(
-        x=x[:idx+1], y=y[:idx+1], z=z[:idx+1], mode="lines",
-        line=dict(color=color_vals[:idx+1], colorscale=palette, width=marker_size/2),
-        name="Trail"
-    ))
-    traces.append(go.Scatter3d(
-        x=[x[idx]], y=[y[idx]], z=[z[idx]], mode="markers",
-        marker=dict(size=marker_size*1.5, color="red", opacity=1.0),
-        name="Current"
-    ))
+    traces.append(trail_trace(p, rows, idx, palette, marker_size))
+    traces.append(current_trace(p, idx, marker_size))
 
-    # camera controls
+    # camera controls: the presets set the camera and bump the scene's
+    # uirevision; otherwise plotly keeps whatever view the user rotated to
     trig = callback_context.triggered[0]["prop_id"].split(".")[0]
-    prev_cam = old_fig.get("layout", {}).get("scene", {}).get("camera") if old_fig else None
     if trig == "btn-top": cam = dict(eye=dict(x=0, y=0, z=2))
     elif trig == "btn-side": cam = dict(eye=dict(x=2, y=0, z=0))
-    elif trig == "btn-iso": cam = dict(eye=dict(x=1.25, y=1.25, z=1.25))
-    else: cam = prev_cam or dict(eye=dict(x=1.25, y=1.25, z=1.25))
+    else: cam = dict(eye=dict(x=1.25, y=1.25, z=1.25))
 
     # assemble 3D
     fig3d = go.Figure(data=traces)
     fig3d.update_layout(
         scene=dict(
             xaxis_title=xcol, yaxis_title=ycol,
-            zaxis_title=f"{zcol} ({du})", camera=cam
+            zaxis_title=f"{zcol} ({p['du']})", camera=cam,
+            uirevision=f"{top or 0}-{side or 0}-{iso or 0}"
         ),
         title=title,
         template="plotly_dark" if dark else "plotly_white",
@@ -444,50 +601,63 @@ def update_plots(
         mapfig = go.Figure(go.Scattermapbox(
             lat=y, lon=x, mode="markers+lines",
             marker=dict(size=4, color=color_vals, colorscale=palette),
-            line=dict(color=color_vals, colorscale=palette, width=2)
+            line=dict(width=2)
         ))
         mapfig.update_layout(
             mapbox_style="open-street-map",
-            mapbox=dict(center=dict(lat=np.mean(y), lon=np.mean(x)), zoom=3),
+            mapbox=dict(center=dict(lat=np.nanmean(y), lon=np.nanmean(x)), zoom=3),
             margin=dict(l=0, r=0, t=0, b=0)
         )
     else:
         mapfig = go.Figure()
 
-    # stats panel
-    raw_time = df[tcol].iloc[idx] if tcol != "None" else None
-    try:
-        human_time = (
-            datetime.fromtimestamp(raw_time, tz=pytz.UTC)
-            .strftime("%Y-%m-%d %H:%M:%S.%f")
-            if pd.api.types.is_numeric_dtype(df[tcol].dtype)
-            else str(raw_time)
-        )
-    except:
-        human_time = str(raw_time)
-
-    stat_items = [
-        html.Div(f"Frame: {idx}"),
-        html.Div(f"{xcol}: {x[idx]:.2f}"),
-        html.Div(f"{ycol}: {y[idx]:.2f}"),
-        html.Div(f"Depth: {depth_disp[idx]:.1f} {du}"),
-        html.Div(f"Time: {raw_time}"),
-        html.Div(f"Converted: {human_time}"),
-    ]
-
-    # Add extra selected columns
-    if extra_cols:
-        for col in extra_cols:
-            try:
-                val = df[col].iloc[idx]
-                stat_items.append(html.Div(f"{col}: {val}"))
-            except:
-                stat_items.append(html.Div(f"{col}: (unavailable)"))
+    return fig3d, stats, {"idx": idx}
 
-    stats = dbc.Alert(stat_items, color="info")
-    return fig3d, stats
+# === Camera zoom → LOD view ===
+@app.callback(
+    Output("lod-view", "data"),
+    Input("3d-plot", "relayoutData"),
+    Input("btn-top", "n_clicks"),
+    Input("btn-side", "n_clicks"),
+    Input("btn-iso", "n_clicks"),
+    State("lod-view", "data"),
+)
+def update_lod_view(relayout, top, side, iso, current):
+    # only changes when the zoom tier or snapped look-at point does, so
+    # rotating the camera doesn't redraw the figure
+    trig = callback_context.triggered[0]["prop_id"].split(".")[0]
+    if trig.startswith("btn-"):
+        view = None
+    elif relayout and "scene.camera" in relayout:
+        view = camera_view(relayout["scene.camera"])
+    else:
+        return no_update
+    return no_update if view == current else view
 
 # === Histogram callback ===
+def histogram_counts(store_data, field, tcol, start_date, end_date):
+    """Bin edges and counts of field within the time window, memoized per (dataset, field, window)."""
+    key=store_data["key"]
+    time_index=None
+    if tcol!="None" and start_date and end_date:
+        time_index=datasets.time_index(store_data, tcol)
+    window=(tcol, start_date, end_date) if time_index is not None else None
+    counts_key=("counts", key, field, window)
+    result=histogram_cache.get(counts_key)
+    if result is not None:
+        return result
+    # the binned column is shared by every window, so a new window only recounts
+    index_key=("index", key, field, window[0] if window else None)
+    hist=histogram_cache.get(index_key)
+    if hist is None:
+        values=pd.to_numeric(datasets.frame(store_data, [field])[field], errors="coerce").to_numpy(dtype=float)
+        hist=HistogramIndex(values, time_index)
+        histogram_cache.put(index_key, hist, hist.nbytes)
+    counts=hist.counts(*time_index.positions(start_date, end_date)) if time_index is not None else hist.counts()
+    result=(hist.edges, counts)
+    histogram_cache.put(counts_key, result, hist.edges.nbytes + counts.nbytes)
+    return result
+
 @app.callback(
     Output("histogram","figure"),
     [
@@ -500,24 +670,21 @@ def update_plots(
         Input("dark-mode","value"),
     ]
 )
-def update_histogram(json_data, tcol, zcol, color_by, start_date, end_date, dark):
-    if not json_data:
+def update_histogram(store_data, tcol, zcol, color_by, start_date, end_date, dark):
+    dataset=datasets.dataset(store_data)
+    if dataset is None:
         return go.Figure()
-    df=pd.read_json(io.StringIO(json_data), orient="split")
-    # apply time filter
-    if tcol!="None" and start_date and end_date:
-        dates=pd.to_datetime(df[tcol], unit="s", errors="coerce").dt.date
-        df=df[dates.between(pd.to_datetime(start_date).date(), pd.to_datetime(end_date).date())]
     # pick field
     field=None
-    if color_by and color_by in df.columns:
+    if color_by and color_by in dataset.columns:
         field=color_by
-    elif zcol and zcol in df.columns:
+    elif zcol and zcol in dataset.columns:
         field=zcol
     else:
         return go.Figure()
-    data=df[field].dropna()
-    fig=go.Figure(go.Histogram(x=data, nbinsx=30))
+    # binned server-side; only the edges and counts go to the browser
+    edges,counts=histogram_counts(store_data, field, tcol, start_date, end_date)
+    fig=go.Figure(go.Bar(x=(edges[:-1]+edges[1:])/2, y=counts, width=np.diff(edges)))
     fig.update_layout(
         title=f"Distribution of {field}",
         template="plotly_dark" if dark else "plotly_white",
@@ -534,12 +701,11 @@ def update_histogram(json_data, tcol, zcol, color_by, start_date, end_date, dark
     Input("df-store","data"),
     Input("time-col","value")
 )
-def update_date_picker(json_data, tcol):
-    if not json_data or tcol=="None":
+def update_date_picker(store_data, tcol):
+    index=datasets.time_index(store_data, tcol) if tcol!="None" else None
+    if index is None:
         return None, None, None, None
-    df=pd.read_json(io.StringIO(json_data), orient="split")
-    times=pd.to_datetime(df[tcol], unit="s", errors="coerce")
-    min_d,max_d=times.min().date(),times.max().date()
+    min_d,max_d=index.bounds()
     return min_d, max_d, min_d, max_d
 
 # === 10. Run the app ===
@@ -1,19 +1,112 @@
+import cProfile
+import fnmatch
+import hashlib
+import io
+import json
+import shutil
 import struct
-from flask import Flask, request, jsonify, send_from_directory
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 import os
-from parsers import SignalAParser, SignalBParser
+from parsers import registry
+from cache import LRUCache, ResultCache, content_hash
+from jobs import DONE, FAILED, JobQueue, QueueFull
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from parallel import ParallelDecoder
+from spatial import SpatialIndex, cluster_level, grid_nbytes
+from tiles import MBTilesReader
+from simplify import LOD_MAX_ZOOM, lod_mask, track_significance
+from payload import COLUMNS_MIMETYPE, COMPRESS_MIN_BYTES, choose_encoding, compress_body, pack_columns
+from decoder import (
+    RECORD_SIZE, STREAM_BLOCK_SIZE, HexDecodeError, capture_stats, decode_columns, decode_resync, columns_to_records,
+    concat_columns, iter_decode_stream, iter_unhex, map_capture,
+)
 
 app = Flask(__name__, static_folder='frontend', static_url_path='')
+# Server-side captures readable through /process_path must live under this directory
+app.config['DATA_ROOT'] = os.environ.get('GEOSIGNAL_DATA_ROOT')
+
+# Decoded results keyed by content hash, so re-uploads of a capture skip decoding
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get('GEOSIGNAL_CACHE_BYTES', 512 * 1024 * 1024)),
+    spill_dir=os.environ.get('GEOSIGNAL_CACHE_DIR'),
+    spill_max_bytes=int(os.environ.get('GEOSIGNAL_CACHE_DIR_BYTES', 4 * 1024 ** 3)),
+)
+# Spatial indexes over cached results, built on first use per dataset
+index_cache = LRUCache(max_bytes=int(os.environ.get('GEOSIGNAL_INDEX_CACHE_BYTES', 256 * 1024 * 1024)))
+# Per-point track simplification significance, computed once per dataset
+lod_cache = LRUCache(max_bytes=int(os.environ.get('GEOSIGNAL_LOD_CACHE_BYTES', 128 * 1024 * 1024)))
+# Encoded point tiles, computed lazily from the spatial index
+data_tile_cache = LRUCache(max_bytes=int(os.environ.get('GEOSIGNAL_TILE_CACHE_BYTES', 64 * 1024 * 1024)))
+# Base map tiles come from this MBTiles file when set, else from frontend/tiles/z/x/y.png
+mbtiles = None
+if os.environ.get('GEOSIGNAL_MBTILES'):
+    mbtiles = MBTilesReader(
+        os.environ['GEOSIGNAL_MBTILES'],
+        pool_size=int(os.environ.get('GEOSIGNAL_MBTILES_CONNECTIONS', 8)),
+        cache_bytes=int(os.environ.get('GEOSIGNAL_MBTILES_CACHE_BYTES', 64 * 1024 * 1024)),
+    )
+# Browsers may reuse a base map tile for this long before revalidating it
+TILE_MAX_AGE = int(os.environ.get('GEOSIGNAL_TILE_MAX_AGE', 86400))
+# Background decodes for ?async=1 uploads. The pool is separate from the
+# request threads, so large jobs can't hold up interactive requests.
+# Uploads wait for their job here, as files rather than in memory, and
+# results over the job result budget are spilled here; None means the system
+# temp directory
+JOB_SPOOL_DIR = os.environ.get('GEOSIGNAL_JOB_SPOOL_DIR')
+decode_jobs = JobQueue(
+    max_workers=int(os.environ.get('GEOSIGNAL_JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('GEOSIGNAL_JOB_QUEUE', 8)),
+    max_result_bytes=int(os.environ.get('GEOSIGNAL_JOB_RESULT_BYTES', 512 * 1024 * 1024)),
+    spill_dir=JOB_SPOOL_DIR,
+)
+# Worker processes for decoding large captures in record-aligned shards; 0 or 1 decodes in-process
+parallel_decoder = ParallelDecoder(workers=int(os.environ.get('GEOSIGNAL_DECODE_WORKERS', 0)))
+# Threads decoding the files of one /process_batch request concurrently
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('GEOSIGNAL_BATCH_THREADS', min(8, os.cpu_count() or 1))),
+    thread_name_prefix='batch-decode',
+)
+# Limits on the uncompressed size of zip archive members in /process_batch,
+# per member and per request, checked before anything is extracted
+BATCH_MAX_MEMBER_BYTES = int(os.environ.get('GEOSIGNAL_BATCH_MAX_MEMBER_BYTES', 1024 ** 3))
+BATCH_MAX_ZIP_BYTES = int(os.environ.get('GEOSIGNAL_BATCH_MAX_ZIP_BYTES', 4 * 1024 ** 3))
+ZIP_MIMETYPES = ('application/zip', 'application/x-zip-compressed')
+# Seconds between keep-alive comments on an idle job event stream
+JOB_EVENT_HEARTBEAT = 15
+# Seconds between checks of a followed capture for newly appended records
+TAIL_POLL_INTERVAL = float(os.environ.get('GEOSIGNAL_TAIL_POLL', 0.05))
 
-# A "factory" or registry of parsers
-PARSERS = {
-    0x2020: SignalAParser(),
-    0x2021: SignalBParser(),
-}
+# Parsers register themselves by sync word in parsers.py via @register_parser
+PARSERS = registry.parsers
+
+# Exposed in the Prometheus text format on /metrics
+metrics = MetricsRegistry()
+decoded_records = metrics.counter(
+    'geosignal_decoded_records_total', 'Records decoded, by sync word.', ('sync_word', 'type'))
+decode_errors = metrics.counter(
+    'geosignal_decode_errors_total',
+    'Records that could not be decoded cleanly, by kind: unknown_sync_word, malformed or truncated.', ('kind',))
+stage_seconds = metrics.histogram(
+    'geosignal_stage_seconds', 'Time spent in each stage of a decode request.', ('endpoint', 'stage'))
+requests_total = metrics.counter(
+    'geosignal_requests_total', 'Instrumented requests by endpoint and status code.', ('endpoint', 'status'))
+# With GEOSIGNAL_PROFILE_DIR set, requests with ?profile=1 are run under
+# cProfile and the stats are written there
+PROFILE_DIR = os.environ.get('GEOSIGNAL_PROFILE_DIR')
 
 def parse_binary_data(data):
     """Parses a byte string for signal data and returns a list of coordinates."""
     coordinates = []
+    # Counted locally and added to the metrics once, rather than logged per record
+    decoded = {}
+    unknown = malformed = 0
     # Process the file in 16-byte chunks
     for i in range(0, len(data), 16):
         chunk = data[i:i+16]
@@ -30,29 +123,579 @@ def parse_binary_data(data):
             try:
                 parsed_data = parser.parse(chunk)
                 coordinates.append(parsed_data)
+                decoded[sync_word] = decoded.get(sync_word, 0) + 1
             except (struct.error, IndexError):
                 # Handle cases where a chunk might be malformed for its type
-                print(f"Skipping malformed chunk for sync word {hex(sync_word)}")
+                malformed += 1
                 continue
         else:
             # Handle unknown signal type
-            print(f"Unknown signal type with sync word: {hex(sync_word)}")
+            unknown += 1
 
+    for sync_word, count in decoded.items():
+        decoded_records.inc(count, sync_word=f'0x{sync_word:04x}', type=PARSERS[sync_word].type_label)
+    if unknown:
+        decode_errors.inc(unknown, kind='unknown_sync_word')
+    if malformed:
+        decode_errors.inc(malformed, kind='malformed')
+    if len(data) % 16:
+        decode_errors.inc(kind='truncated')
     return coordinates
 
+def count_decode(data, columns):
+    """Adds the records of a decoded buffer to the per-sync-word and error counters."""
+    stats = capture_stats(data, columns)
+    for sync_word, count in stats['sync_words'].items():
+        parser = PARSERS.get(int(sync_word, 16))
+        if parser is not None:
+            decoded_records.inc(count, sync_word=sync_word, type=parser.type_label)
+    if stats['unknown']:
+        decode_errors.inc(stats['unknown'], kind='unknown_sync_word')
+    if stats['malformed']:
+        decode_errors.inc(stats['malformed'], kind='malformed')
+    if stats['trailing_bytes']:
+        decode_errors.inc(kind='truncated')
+    return stats
+
+def stage(name):
+    """Times a stage of the current request into stage_seconds, if its endpoint is instrumented."""
+    return stage_seconds.time(endpoint=g.metrics_endpoint, stage=name)
+
+def decode_block(data, path=None, offset=0):
+    """
+    Decodes a buffer of records, across the worker pool when it is large enough.
+
+    When the buffer is bytes offset.. of the capture file at path, workers
+    map the file themselves instead of receiving a copy of the bytes.
+    """
+    if not parallel_decoder.wants(len(data)):
+        return decode_columns(data)
+    if path is not None:
+        return parallel_decoder.decode_file(path, offset, offset + len(data))
+    return parallel_decoder.decode(data)
+
+def decode_request_data(data, path=None, offset=0):
+    """
+    Decodes request bytes, resynchronizing on sync words when ?resync=1 is set.
+
+    Plain decodes go through the result cache. Returns (columns, skipped,
+    digest): skipped is None unless resync was requested, and digest is the
+    content hash the result is cached under (None for resync decodes).
+    """
+    if request.values.get('resync'):
+        columns, skipped = decode_resync(data)
+        return columns, skipped, None
+
+    columns, digest, _ = decode_cached(data, path, offset)
+    return columns, None, digest
+
+def decode_cached(data, path=None, offset=0):
+    """
+    Decodes a buffer through the result cache. Returns (columns, digest, stats).
+
+    stats are the capture_stats() counted while decoding, or None when the
+    result came from the cache.
+    """
+    digest = content_hash(data)
+    key = (digest, registry.version)
+    columns = result_cache.get(key)
+    stats = None
+    if columns is None:
+        columns = decode_block(data, path, offset)
+        stats = count_decode(data, columns)
+        result_cache.put_columns(key, columns)
+    return columns, digest, stats
+
+def decode_hex_stream(stream):
+    """
+    Decodes hex text read from a binary stream, block by block.
+
+    Neither the text nor the bytes it encodes are held in full: each block
+    of bytes goes straight to decode_columns(), with a partial record carried
+    over to the next, and is hashed on the way so the result is cached like
+    any other decode. Returns (columns, skipped, digest) like
+    decode_request_data(); resync decodes need the whole capture at once.
+    Raises HexDecodeError for text that isn't hex.
+    """
+    if request.values.get('resync'):
+        columns, skipped = decode_resync(b''.join(iter_unhex(stream)))
+        return columns, skipped, None
+
+    hasher = hashlib.sha256()
+    parts = []
+    carry = b''
+    for block in iter_unhex(stream):
+        hasher.update(block)
+        if carry:
+            block = carry + block
+        usable = len(block) - len(block) % RECORD_SIZE
+        carry = block[usable:]
+        with memoryview(block)[:usable] as records:
+            columns = decode_columns(records)
+            count_decode(records, columns)
+        parts.append(columns)
+    if carry:
+        decode_errors.inc(kind='truncated')
+
+    columns = concat_columns(parts)
+    digest = hasher.hexdigest()
+    result_cache.put_columns((digest, registry.version), columns)
+    return columns, None, digest
+
+def points_response(columns, skipped=None, digest=None):
+    """
+    Returns the decoded points in the format the client asked for.
+
+    Clients that accept application/vnd.geosignal.columns get the packed
+    binary payload (float32 coordinates with precision=32); everyone else
+    gets the JSON list, wrapped with the skipped byte ranges after a resync.
+    The content hash, when known, is sent as X-Content-Hash so the client
+    can fetch the result again from /results/<hash>. With lod=<zoom> the
+    signal tracks are simplified to the level of detail of that map zoom.
+    """
+    lod_zoom = request.values.get('lod', type=int)
+    if lod_zoom is not None and digest is not None:
+        keep = lod_mask(get_track_significance(digest, columns), lod_zoom)
+        columns = {name: column[keep] for name, column in columns.items()}
+
+    best = request.accept_mimetypes.best_match(['application/json', COLUMNS_MIMETYPE])
+    if best == COLUMNS_MIMETYPE:
+        coord_dtype = np.float32 if request.values.get('precision') == '32' else np.float64
+        body = pack_columns(columns, registry.labels(), coord_dtype, skipped)
+        response = Response(body, mimetype=COLUMNS_MIMETYPE)
+    else:
+        points = columns_to_records(columns)
+        if skipped is None:
+            response = jsonify(points)
+        else:
+            response = jsonify({'points': points, 'skipped': [list(span) for span in skipped]})
+
+    if digest is not None:
+        response.headers['X-Content-Hash'] = digest
+    return response
+
+@app.before_request
+def start_profiling():
+    if PROFILE_DIR and request.args.get('profile'):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+# Registered before compress_response so that it runs after it
+@app.after_request
+def finish_request_metrics(response):
+    """Counts instrumented requests, times sending the body and saves a requested profile."""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        name = f"{request.endpoint or 'request'}-{time.strftime('%Y%m%d-%H%M%S')}-{id(profiler):x}.prof"
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+        response.headers['X-Profile'] = name
+
+    endpoint = g.get('metrics_endpoint')
+    if endpoint is not None:
+        requests_total.inc(endpoint=endpoint, status=str(response.status_code))
+        # The body is sent after the view returns; the server closes the response when done
+        sending = time.perf_counter()
+        response.call_on_close(lambda: stage_seconds.observe(
+            time.perf_counter() - sending, endpoint=endpoint, stage='send'))
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Gzips or deflates decoded payloads for clients that accept it."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('application/json', 'application/geo+json', COLUMNS_MIMETYPE)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if g.get('metrics_endpoint') is not None:
+        with stage('compress'):
+            response.set_data(compress_body(body, encoding))
+    else:
+        response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def get_spatial_index(digest):
+    """Returns the spatial index for a cached dataset, building it once, or None if unknown."""
+    key = (digest.lower(), registry.version)
+    index = index_cache.get(key)
+    if index is None:
+        columns = result_cache.get(key)
+        if columns is None:
+            return None
+        index = SpatialIndex(columns, len(registry.parsers))
+        index_cache.put(key, index, index.nbytes)
+    return index
+
+def get_cluster_grid(digest, index, zoom):
+    """Returns the cluster grid of a dataset's index at a map zoom, cached as its own index_cache entry."""
+    level = cluster_level(zoom)
+    key = (digest.lower(), registry.version, level)
+    grid = index_cache.get(key)
+    if grid is None:
+        grid = index.grid(level)
+        index_cache.put(key, grid, grid_nbytes(grid))
+    return grid
+
+def get_track_significance(digest, columns=None):
+    """
+    Returns the per-point simplification significance of a dataset, computing it once.
+
+    The dataset is looked up in the result cache unless its columns are
+    passed in. Returns None if it has been evicted and wasn't passed.
+    """
+    key = (digest.lower(), registry.version)
+    significance = lod_cache.get(key)
+    if significance is None:
+        if columns is None:
+            columns = result_cache.get(key)
+        if columns is None:
+            return None
+        significance = track_significance(columns)
+        lod_cache.put(key, significance, significance.nbytes)
+    return significance
+
+def requested_types():
+    """Type codes named in the ?types=A,B filter, or None for every type."""
+    names = request.args.get('types')
+    if names is None:
+        return None
+    labels = registry.labels()
+    return [labels.index(name) for name in names.split(',') if name in labels]
+
+def resolve_data_path(relative_path):
+    """Resolves a client-supplied path under DATA_ROOT, or returns None if it escapes it."""
+    root = app.config.get('DATA_ROOT')
+    if not root or not relative_path:
+        return None
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+def resolve_data_dir(relative_path):
+    """Resolves a client-supplied directory under DATA_ROOT, or returns None if it escapes it."""
+    root = app.config.get('DATA_ROOT')
+    if not root or relative_path is None:
+        return None
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, path]) != root or not os.path.isdir(path):
+        return None
+    return path
+
+def _int_arg(name, default=None):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer.")
+
+def requested_byte_range(size):
+    """
+    Reads the optional range of a /process_path request as (start, stop) byte offsets.
+
+    Accepts either a record range (start, count) or a byte range (offset,
+    length); an offset inside a record is rounded down to the record's
+    start. Raises ValueError for negative or non-integer values.
+    """
+    if 'offset' in request.args or 'length' in request.args:
+        start = _int_arg('offset', 0)
+        length = _int_arg('length', size)
+    else:
+        start = _int_arg('start', 0) * RECORD_SIZE
+        count = _int_arg('count')
+        length = count * RECORD_SIZE if count is not None else size
+    if start < 0 or length < 0:
+        raise ValueError("Range values must be non-negative integers.")
+    stop = min(start + length, size)
+    # Only whole records decode correctly, so start on a record boundary
+    start = min(start - start % RECORD_SIZE, size)
+    return start, stop
+
+def _stream_records(blocks, ndjson):
+    """Serializes decoded blocks one at a time as a JSON array or as NDJSON lines."""
+    if ndjson:
+        for columns in blocks:
+            yield ''.join(json.dumps(point) + '\n' for point in columns_to_records(columns))
+        return
+
+    yield '['
+    first = True
+    for columns in blocks:
+        if not len(columns['lat']):
+            continue
+        # Strip the brackets so each block's points join the one outer array
+        body = json.dumps(columns_to_records(columns))[1:-1]
+        yield body if first else ',' + body
+        first = False
+    yield ']'
+
+def stream_decoded_response(file):
+    """
+    Decodes an uploaded file block by block and streams the points back.
+
+    Returns None if the file holds no valid records, so the caller can still
+    answer with an error status before any of the body has been sent.
+    """
+    blocks = iter_decode_stream(file.stream)
+    for columns in blocks:
+        if len(columns['lat']):
+            break
+    else:
+        return None
+
+    # Flask closes request.files as soon as the view returns, before the body
+    # is generated. Take ownership of the upload stream and close it ourselves.
+    stream = file.stream
+    file.stream = io.BytesIO()
+
+    def chained():
+        try:
+            yield columns
+            yield from blocks
+        finally:
+            stream.close()
+
+    ndjson = request.accept_mimetypes.best == 'application/x-ndjson'
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(_stream_records(chained(), ndjson)), mimetype=mimetype)
+
+def run_decode_job(job, path):
+    """
+    Decodes a spooled upload block by block for a background job.
+
+    The result is kept on the job and cached by content hash; the spool file
+    is removed once the job is over, whether it succeeded or not.
+    """
+    try:
+        job.start()
+        with map_capture(path) as mapped:
+            with memoryview(mapped) as view:
+                digest = content_hash(view)
+                key = (digest, registry.version)
+                columns = result_cache.get(key)
+                if columns is None:
+                    parts = []
+                    # Blocks big enough to fan out when parallel decoding is on
+                    block_size = max(STREAM_BLOCK_SIZE, parallel_decoder.min_bytes) if parallel_decoder.workers > 1 else STREAM_BLOCK_SIZE
+                    for start in range(0, len(view), block_size):
+                        with view[start:start + block_size] as block:
+                            parts.append(decode_block(block, path, start))
+                            job.advance(len(block) // RECORD_SIZE)
+                    columns = concat_columns(parts)
+                    count_decode(view, columns)
+                    if not len(columns['lat']):
+                        raise ValueError("No valid data points found in the file.")
+                    result_cache.put_columns(key, columns)
+                else:
+                    job.advance(job.total_records)
+        job.finish(digest, columns)
+    finally:
+        os.remove(path)
+
+def submit_decode_job(file):
+    """
+    Queues a background decode of an upload and answers 202 with the job status, or 503 if the queue is full.
+
+    The upload is spooled to a file rather than held in memory while it waits.
+    """
+    with tempfile.NamedTemporaryFile(dir=JOB_SPOOL_DIR, suffix='.fbf', delete=False) as spool:
+        file.save(spool)
+        size = spool.tell()
+    try:
+        job = decode_jobs.submit(run_decode_job, spool.name, total_records=size // RECORD_SIZE)
+    except QueueFull as e:
+        os.remove(spool.name)
+        response = jsonify({"error": f"Decode queue is full: {e}."})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    response = jsonify(job.snapshot())
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response, 202
+
+def _job_events(job):
+    """Server-sent events with the job status on every change, ending once it finishes."""
+    while True:
+        version = job.version
+        snapshot = job.snapshot()
+        event = snapshot['state'] if job.is_finished else 'progress'
+        yield f'event: {event}\ndata: {json.dumps(snapshot)}\n\n'
+        if job.is_finished:
+            return
+        if job.wait(version, JOB_EVENT_HEARTBEAT) == version:
+            yield ': keep-alive\n\n'
+
+def _tail_events(path, offset):
+    """
+    Follows a capture that is still being written, from byte offset on.
+
+    Every read of newly appended complete records is decoded on its own and
+    sent as a 'points' event whose id is the byte offset reached, so a
+    reconnecting EventSource resumes from there via Last-Event-ID. A partial
+    record at the end of the file waits for the writer to complete it.
+
+    If the file shrinks it was truncated, and if another file has been
+    renamed over the path (as log rotation does) the new one is opened once
+    the old one has been read to its end. Either way following restarts at
+    the start of the file after a 'reset' event.
+    """
+    f = open(path, 'rb')
+    try:
+        idle_since = time.monotonic()
+        while True:
+            opened = os.fstat(f.fileno())
+            if opened.st_size < offset:
+                offset = 0
+                yield f'id: 0\nevent: reset\ndata: {{}}\n\n'
+            available = (opened.st_size - offset) // RECORD_SIZE * RECORD_SIZE
+            if not available:
+                try:
+                    current = os.stat(path)
+                    if (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev):
+                        replacement = open(path, 'rb')
+                        f.close()
+                        f = replacement
+                        offset = 0
+                        yield f'id: 0\nevent: reset\ndata: {{}}\n\n'
+                        continue
+                except FileNotFoundError:
+                    # Between the old file being moved away and the new one taking its place
+                    pass
+                if time.monotonic() - idle_since >= JOB_EVENT_HEARTBEAT:
+                    idle_since = time.monotonic()
+                    yield ': keep-alive\n\n'
+                time.sleep(TAIL_POLL_INTERVAL)
+                continue
+
+            f.seek(offset)
+            data = f.read(min(available, STREAM_BLOCK_SIZE))
+            columns = decode_columns(data)
+            count_decode(data, columns)
+            offset += len(data)
+            idle_since = time.monotonic()
+            if len(columns['lat']):
+                body = json.dumps({'offset': offset, 'points': columns_to_records(columns)})
+                yield f'id: {offset}\nevent: points\ndata: {body}\n\n'
+    finally:
+        f.close()
+
+def decode_batch_item(name, data):
+    """Decodes one file of a batch, returning (columns, stats)."""
+    columns, digest, stats = decode_cached(data)
+    if stats is None:
+        stats = capture_stats(data, columns)
+    stats.update(name=name, digest=digest, points=len(columns['lat']))
+    return columns, stats
+
+def decode_batch_file(name, path):
+    with map_capture(path) as mapped:
+        with memoryview(mapped) as view:
+            return decode_batch_item(name, view)
+
+def extract_batch_archive(stream, spool_dir, inputs):
+    """
+    Extracts the members of an uploaded zip archive into spool_dir, adding them to inputs.
+
+    Members are copied in blocks rather than read whole, after their
+    declared sizes have been checked against the batch limits (zipfile
+    stops reading a member at its declared size).
+    """
+    with zipfile.ZipFile(stream) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        for info in members:
+            if info.file_size > BATCH_MAX_MEMBER_BYTES:
+                raise ValueError(
+                    f"{info.filename} is {info.file_size} bytes uncompressed, "
+                    f"over the limit of {BATCH_MAX_MEMBER_BYTES}.")
+        total = sum(info.file_size for info in members)
+        if total > BATCH_MAX_ZIP_BYTES:
+            raise ValueError(
+                f"The archive holds {total} bytes uncompressed, over the limit of {BATCH_MAX_ZIP_BYTES}.")
+        for info in members:
+            path = os.path.join(spool_dir, f'{len(inputs)}.fbf')
+            with archive.open(info) as member, open(path, 'wb') as f:
+                shutil.copyfileobj(member, f, STREAM_BLOCK_SIZE)
+            inputs.append((info.filename, None, path))
+
+def batch_inputs(spool_dir):
+    """
+    Collects the captures of a /process_batch request as (name, data or None, path or None).
+
+    Takes uploaded 'files' or dir=<path> under DATA_ROOT. Uploads named
+    .zip or sent as a zip content type are archives whose members are
+    extracted into spool_dir. Raises ValueError when there is nothing to
+    decode or an archive is over the size limits.
+    """
+    if 'dir' in request.values:
+        directory = resolve_data_dir(request.values['dir'])
+        if directory is None:
+            raise FileNotFoundError("Directory not found under the data root.")
+        pattern = request.values.get('pattern', '*.fbf')
+        names = sorted(name for name in os.listdir(directory)
+                       if fnmatch.fnmatch(name, pattern) and os.path.isfile(os.path.join(directory, name)))
+        return [(name, None, os.path.join(directory, name)) for name in names]
+
+    inputs = []
+    for file in request.files.getlist('files') + request.files.getlist('file'):
+        if file.filename.lower().endswith('.zip') or file.mimetype in ZIP_MIMETYPES:
+            extract_batch_archive(file.stream, spool_dir, inputs)
+        else:
+            inputs.append((file.filename, file.read(), None))
+    if not inputs:
+        raise ValueError("No files provided.")
+    return inputs
+
 @app.route('/')
 def serve_index():
     return send_from_directory(app.static_folder, 'index.html')
 
 @app.route('/tiles/<int:z>/<int:x>/<int:y>.png')
 def serve_tile(z, x, y):
-    """Serve map tiles from the local 'tiles' directory."""
-    # The 'tiles' directory should be inside the 'frontend' directory.
-    tile_path = os.path.join(app.static_folder, 'tiles', str(z), str(x))
-    return send_from_directory(tile_path, f'{y}.png')
+    """
+    Serve map tiles from the MBTiles file, or from the local 'tiles' directory.
+
+    Tiles carry a strong ETag and Cache-Control, and a matching
+    If-None-Match is answered with 304 Not Modified.
+    """
+    if mbtiles is None:
+        # The 'tiles' directory should be inside the 'frontend' directory.
+        tile_path = os.path.join(app.static_folder, 'tiles', str(z), str(x))
+        response = send_from_directory(tile_path, f'{y}.png', max_age=TILE_MAX_AGE)
+        response.cache_control.public = True
+        return response
+
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": "Tile coordinates out of range."}), 404
+    body, etag = mbtiles.get(z, x, y)
+    if body is None:
+        return jsonify({"error": "Tile not found."}), 404
+    response = Response(body, mimetype=mbtiles.mimetype)
+    # Vector tiles are stored gzipped in MBTiles
+    if body[:2] == b'\x1f\x8b':
+        response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = TILE_MAX_AGE
+    return response.make_conditional(request)
 
 @app.route('/process_file', methods=['POST'])
 def process_file():
+    g.metrics_endpoint = 'process_file'
+    # The first request.files access parses the multipart body, so the read
+    # stage starts here rather than at file.read()
+    read_started = time.perf_counter()
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
     
@@ -61,42 +704,354 @@ def process_file():
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
 
+    # ?async=1 queues the decode and returns a job ID straight away
+    if request.args.get('async'):
+        if request.values.get('resync'):
+            return jsonify({"error": "resync is not supported for async jobs."}), 400
+        return submit_decode_job(file)
+
     try:
+        # ?stream=1 decodes the upload in fixed-size blocks and streams the
+        # response, so memory stays flat regardless of file size.
+        if request.args.get('stream'):
+            if request.values.get('resync'):
+                return jsonify({"error": "resync is not supported for streamed decodes."}), 400
+            response = stream_decoded_response(file)
+            if response is None:
+                return jsonify({"error": "No valid data points found in the file."}), 400
+            return response
+
         file_content = file.read()
-        coordinates = parse_binary_data(file_content)
+        stage_seconds.observe(time.perf_counter() - read_started, endpoint='process_file', stage='read')
+        with stage('decode'):
+            columns, skipped, digest = decode_request_data(file_content)
 
-        if not coordinates:
+        if not len(columns['lat']):
             return jsonify({"error": "No valid data points found in the file."}), 400
 
-        return jsonify(coordinates)
+        with stage('serialize'):
+            return points_response(columns, skipped, digest)
+
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+@app.route('/process_path', methods=['GET'])
+def process_path():
+    """
+    Decodes a capture that already sits under DATA_ROOT on the server.
+
+    The file is memory-mapped and decoded straight from the mapping, so only
+    the requested range is ever read. Use start/count (records) or
+    offset/length (bytes) to page through a large capture.
+    """
+    path = resolve_data_path(request.args.get('path'))
+    if path is None:
+        return jsonify({"error": "File not found under the data root."}), 404
+
+    try:
+        with map_capture(path) as mapped:
+            size = len(mapped)
+            start, stop = requested_byte_range(size)
+            with memoryview(mapped)[start:stop] as view:
+                columns, skipped, digest = decode_request_data(view, path, start)
+
+        if not len(columns['lat']):
+            return jsonify({"error": "No valid data points found in the requested range."}), 400
+
+        if skipped is not None:
+            skipped = [(span_start + start, span_end + start) for span_start, span_end in skipped]
+        response = points_response(columns, skipped, digest)
+        response.headers['X-Total-Records'] = str(size // RECORD_SIZE)
+        response.headers['X-Byte-Range'] = f'{start}-{stop}'
+        return response
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+@app.route('/tail_path', methods=['GET'])
+def tail_path():
+    """
+    Streams the records appended to a capture under DATA_ROOT as server-sent events.
+
+    Starts at byte offset (default 0, or 'end' for only records written from
+    now on), or after the last event a reconnecting client received.
+    """
+    path = resolve_data_path(request.args.get('path'))
+    if path is None:
+        return jsonify({"error": "File not found under the data root."}), 404
+
+    offset = request.headers.get('Last-Event-ID') or request.args.get('offset', '0')
+    if offset == 'end':
+        offset = os.path.getsize(path)
+    else:
+        try:
+            offset = int(offset)
+        except ValueError:
+            return jsonify({"error": "'offset' must be a byte offset or 'end'."}), 400
+        if offset < 0:
+            return jsonify({"error": "'offset' must be non-negative."}), 400
+    # Only whole records are decoded, so start on a record boundary
+    offset -= offset % RECORD_SIZE
+
+    response = Response(_tail_events(path, offset), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/process_batch', methods=['POST'])
+def process_batch():
+    """
+    Decodes many captures in one request and returns them as one merged dataset.
+
+    Files are decoded concurrently, each through the result cache. Every
+    point carries the name of the file it came from in 'source', and
+    'files' lists per-file statistics in input order. The merged dataset
+    is cached too, so its X-Content-Hash works with /clusters and
+    /data_tiles like any other result.
+    """
+    try:
+        with tempfile.TemporaryDirectory(dir=JOB_SPOOL_DIR) as spool_dir:
+            try:
+                inputs = batch_inputs(spool_dir)
+            except FileNotFoundError as e:
+                return jsonify({"error": str(e)}), 404
+            # Corrupt or encrypted archives, and compression methods zipfile can't read
+            except (ValueError, zipfile.BadZipFile, RuntimeError, NotImplementedError, EOFError, zlib.error) as e:
+                return jsonify({"error": str(e)}), 400
+            return merge_batch(inputs)
+    except OSError as e:
+        # Typically the spool directory filling up during extraction
+        return jsonify({"error": f"Could not extract the uploads: {e}"}), 500
+
+def merge_batch(inputs):
+    """Decodes the collected batch inputs concurrently and builds the merged response."""
+    try:
+        futures = [
+            batch_executor.submit(decode_batch_file, name, path) if path is not None
+            else batch_executor.submit(decode_batch_item, name, data)
+            for name, data, path in inputs
+        ]
+        results = [future.result() for future in futures]
+
+        parts = []
+        for source, (columns, _) in enumerate(results):
+            part = dict(columns)
+            part['source'] = np.full(len(columns['lat']), source, dtype=np.uint32)
+            parts.append(part)
+        merged = concat_columns(parts)
+        files = [stats for _, stats in results]
+        if not len(merged['lat']):
+            return jsonify({"error": "No valid data points found in the files.", "files": files}), 400
+
+        # The merged result is keyed by the names and contents of its files
+        digest = content_hash(json.dumps([[f['name'], f['digest']] for f in files]).encode('utf-8'))
+        result_cache.put_columns((digest, registry.version), merged)
+
+        names = [stats['name'] for stats in files]
+        points = columns_to_records(merged)
+        for point, source in zip(points, merged['source'].tolist()):
+            point['source'] = names[source]
+        response = jsonify({'files': files, 'points': points})
+        response.headers['X-Content-Hash'] = digest
+        return response
 
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
 @app.route('/process_hex', methods=['POST'])
 def process_hex():
-    hex_string = request.form.get('hex_data')
-    if not hex_string:
-        return jsonify({"error": "No hex data provided."}), 400
+    """
+    Decodes hex text from the hex_data form field, or from the raw body.
+
+    A text/plain or application/octet-stream body is read and decoded block
+    by block as it arrives, which suits multi-MB hex dumps. Both are decoded
+    by iter_unhex(), so the same text gives the same result either way;
+    ASCII whitespace is ignored, and invalid hex is reported with the byte offset of
+    the first bad character.
+    """
+    g.metrics_endpoint = 'process_hex'
+    if request.mimetype in ('text/plain', 'application/octet-stream'):
+        stream = request.stream
+    else:
+        with stage('read'):
+            hex_string = request.form.get('hex_data')
+        if hex_string is None:
+            return jsonify({"error": "No hex data provided."}), 400
+        # Decoded by the same iter_unhex() as a raw body, so both skip the
+        # same whitespace and an empty field fails like an empty body
+        stream = io.BytesIO(hex_string.encode('utf-8'))
 
     try:
-        # Clean up the hex string (remove spaces, newlines, etc.)
-        hex_string = ''.join(hex_string.split())
-        # Convert hex string to bytes
-        byte_data = bytes.fromhex(hex_string)
-        
-        coordinates = parse_binary_data(byte_data)
+        with stage('decode'):
+            columns, skipped, digest = decode_hex_stream(stream)
 
-        if not coordinates:
+        if not len(columns['lat']):
             return jsonify({"error": "No valid data points found in the hex string."}), 400
 
-        return jsonify(coordinates)
+        with stage('serialize'):
+            return points_response(columns, skipped, digest)
+    except HexDecodeError as e:
+        return jsonify({"error": str(e), "offset": e.offset}), 400
     except ValueError:
         return jsonify({"error": "Invalid hex string format."}), 400
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Reports a background decode's state and progress in records."""
+    job = decode_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    """Streams a background decode's progress as server-sent events."""
+    job = decode_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    response = Response(_job_events(job), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stops nginx-style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Returns the points decoded by a finished background job."""
+    job = decode_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    if job.state == FAILED:
+        return jsonify({"error": job.error}), 400
+    if job.state != DONE:
+        return jsonify(job.snapshot()), 409
+    columns = job.load_result()
+    if columns is None:
+        return jsonify({"error": "The job has expired."}), 410
+    return points_response(columns, digest=job.digest)
+
+@app.route('/results/<digest>', methods=['GET'])
+def get_result(digest):
+    """
+    Returns a previously decoded capture by its content hash, without re-uploading it.
+
+    A HEAD request only checks whether the result is cached, and doesn't
+    count as a cache hit or miss.
+    """
+    digest = digest.lower()
+    if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest):
+        return jsonify({"error": "Expected a hex SHA-256 content hash."}), 400
+    if request.method == 'HEAD':
+        return Response(status=200 if (digest, registry.version) in result_cache else 404)
+    columns = result_cache.get((digest, registry.version))
+    if columns is None:
+        return jsonify({"error": "No cached result for this hash."}), 404
+    return points_response(columns, digest=digest)
+
+@app.route('/clusters/<digest>', methods=['GET'])
+def get_clusters(digest):
+    """
+    Aggregates a cached dataset into grid clusters for the visible map area.
+
+    Takes bbox=west,south,east,north and the map zoom. Each cluster covers a
+    64px grid cell and reports its point count, centroid and per-type
+    breakdown, so the response size depends on the viewport, not the dataset.
+    """
+    index = get_spatial_index(digest)
+    if index is None:
+        return jsonify({"error": "No cached result for this hash."}), 404
+
+    try:
+        west, south, east, north = (float(v) for v in request.args.get('bbox', '').split(','))
+        zoom = int(request.args.get('zoom', ''))
+    except ValueError:
+        return jsonify({"error": "Expected bbox=west,south,east,north and an integer zoom."}), 400
+
+    labels = registry.labels()
+    grid_zoom = max(zoom, 0)
+    grid = get_cluster_grid(digest, index, grid_zoom)
+    clusters = index.clusters((west, south, east, north), grid_zoom, requested_types(), grid)
+    for cluster in clusters:
+        cluster['types'] = {labels[code]: count for code, count in enumerate(cluster['types']) if count}
+    return jsonify({'zoom': zoom, 'count': len(index), 'clusters': clusters})
+
+@app.route('/data_tiles/<digest>/<int:z>/<int:x>/<int:y>.<fmt>', methods=['GET'])
+def serve_data_tile(digest, z, x, y, fmt):
+    """
+    Serves the points of a cached dataset that fall inside map tile z/x/y.
+
+    .bin returns the packed columns payload and .json a GeoJSON
+    FeatureCollection. Points are decimated to one per type per tile pixel,
+    and encoded tiles are kept in an LRU cache.
+    """
+    if fmt not in ('bin', 'json'):
+        return jsonify({"error": "Tile format must be .bin or .json."}), 404
+    if not 0 <= z <= 24 or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": "Tile coordinates out of range."}), 404
+
+    types = requested_types()
+    key = (digest.lower(), registry.version, z, x, y, fmt, tuple(types) if types is not None else None)
+    body = data_tile_cache.get(key)
+    if body is None:
+        index = get_spatial_index(digest)
+        if index is None:
+            return jsonify({"error": "No cached result for this hash."}), 404
+
+        positions = index.tile_points(z, x, y, types)
+        columns = {'lat': index.lat[positions], 'lng': index.lng[positions], 'type': index.type[positions]}
+        if fmt == 'bin':
+            body = pack_columns(columns, registry.labels())
+        else:
+            body = json.dumps({
+                'type': 'FeatureCollection',
+                'features': [
+                    {
+                        'type': 'Feature',
+                        'geometry': {'type': 'Point', 'coordinates': [point['lng'], point['lat']]},
+                        'properties': {'type': point['type']},
+                    }
+                    for point in columns_to_records(columns)
+                ],
+            }).encode('utf-8')
+        data_tile_cache.put(key, body, len(body))
+
+    mimetype = COLUMNS_MIMETYPE if fmt == 'bin' else 'application/geo+json'
+    return Response(body, mimetype=mimetype)
+
+@app.route('/lod/<digest>', methods=['GET'])
+def get_lod_levels(digest):
+    """Lists how many points a cached dataset keeps at each precomputed level of detail."""
+    significance = get_track_significance(digest)
+    if significance is None:
+        return jsonify({"error": "No cached result for this hash."}), 404
+    levels = [
+        {'zoom': zoom, 'points': int(lod_mask(significance, zoom).sum())}
+        for zoom in range(LOD_MAX_ZOOM + 1)
+    ]
+    return jsonify({'count': len(significance), 'levels': levels})
+
+@app.route('/metrics', methods=['GET'])
+def serve_metrics():
+    """Decode counters and stage timings in the Prometheus text exposition format."""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    stats = result_cache.stats()
+    stats['indexes'] = index_cache.stats()
+    stats['lod'] = lod_cache.stats()
+    stats['data_tiles'] = data_tile_cache.stats()
+    stats['jobs'] = decode_jobs.stats()
+    if mbtiles is not None:
+        stats['mbtiles'] = mbtiles.cache.stats()
+    return jsonify(stats)
+
+
 @app.route('/about')
 def serve_about():
     return send_from_directory(app.static_folder, 'about.html')
@@ -0,0 +1,241 @@
+"""
+Decode throughput benchmark.
+
+Generates a synthetic capture and times each decode path end to end, each in
+a fresh process so peak RSS is measured per path:
+
+    python bench_decode.py --records 1000000 --unknown 0.01 --output bench.json
+    python bench_decode.py --compare bench.json
+
+Results are written as JSON. With --compare the run fails (exit status 1)
+when a path's records/s drops more than --tolerance below the baseline.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from queue import Empty
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from decoder import RECORD_SIZE, columns_to_records, decode_columns, decode_resync, iter_decode_stream, concat_columns
+from parsers import registry
+
+PATHS = ('reference', 'columns', 'stream', 'resync', 'parallel')
+
+
+def generate_capture(records, a_ratio=0.5, unknown=0.0, misaligned=0.0, truncate=0, seed=0):
+    """
+    Builds a synthetic capture of Signal A and B records as bytes.
+
+    unknown is the fraction of records with an unregistered sync word,
+    misaligned the fraction of record boundaries followed by 1-15 stray
+    bytes, and truncate the length of a partial record appended at the end.
+    """
+    rng = np.random.default_rng(seed)
+    known = 1.0 - unknown
+    kinds = rng.choice(3, size=records, p=[known * a_ratio, known * (1 - a_ratio), unknown])
+    lat = rng.uniform(-80, 80, records)
+    lng = rng.uniform(-179, 179, records)
+    buf = np.zeros((records, RECORD_SIZE), dtype=np.uint8)
+
+    rows = np.flatnonzero(kinds == 0)
+    buf[rows, 0:2] = np.frombuffer(b'\x20\x20', dtype=np.uint8)
+    buf[rows, 8:12] = np.round(lat[rows] * 100000).astype('<i4').view(np.uint8).reshape(-1, 4)
+    buf[rows, 12:16] = np.round(lng[rows] * 100000).astype('<i4').view(np.uint8).reshape(-1, 4)
+
+    rows = np.flatnonzero(kinds == 1)
+    buf[rows, 0:2] = np.frombuffer(b'\x20\x21', dtype=np.uint8)
+    buf[rows, 6:10] = lng[rows].astype('>f4').view(np.uint8).reshape(-1, 4)
+    buf[rows, 10:14] = lat[rows].astype('>f4').view(np.uint8).reshape(-1, 4)
+
+    rows = np.flatnonzero(kinds == 2)
+    unregistered = np.flatnonzero(registry.lookup_table() < 0)
+    words = rng.choice(unregistered, size=len(rows)).astype('>u2')
+    buf[rows, 2:] = rng.integers(0, 256, (len(rows), RECORD_SIZE - 2), dtype=np.uint8)
+    buf[rows, 0:2] = words.view(np.uint8).reshape(-1, 2)
+
+    flat = buf.reshape(-1)
+    if misaligned:
+        boundaries = np.flatnonzero(rng.random(records) < misaligned) * RECORD_SIZE
+        counts = rng.integers(1, RECORD_SIZE, len(boundaries))
+        positions = np.repeat(boundaries, counts)
+        flat = np.insert(flat, positions, rng.integers(0, 256, len(positions), dtype=np.uint8))
+    return flat.tobytes() + bytes(rng.integers(0, 256, truncate, dtype=np.uint8))
+
+
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _decode(path, data, parallel):
+    """Runs one decode path; returns (result, serialize) where serialize() produces the JSON body."""
+    if path == 'reference':
+        from app import parse_binary_data
+        points = parse_binary_data(data)
+        return points, lambda: json.dumps(points)
+    if path == 'columns':
+        columns = decode_columns(data)
+    elif path == 'stream':
+        columns = concat_columns(iter_decode_stream(io.BytesIO(data)))
+    elif path == 'resync':
+        columns, _ = decode_resync(data)
+    elif path == 'parallel':
+        columns = parallel.decode(data)
+    else:
+        raise ValueError(f"Unknown decode path {path!r}")
+    return columns, lambda: json.dumps(columns_to_records(columns))
+
+
+def run_case(path, capture_path, repeat, workers, queue):
+    """Child process entry point: times one decode path and reports its result on queue."""
+    with open(capture_path, 'rb') as f:
+        data = f.read()
+    parallel = None
+    if path == 'parallel':
+        from parallel import SHARDS_PER_WORKER, ParallelDecoder
+        parallel = ParallelDecoder(workers, min_bytes=0)
+        # Workers are spawned on demand, so warm up with enough shards to start all of them
+        parallel.decode(data[:RECORD_SIZE * workers * SHARDS_PER_WORKER])
+    best = None
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result, serialize = _decode(path, data, parallel)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if parallel is not None:
+            parallel.close()
+    start = time.perf_counter()
+    body = serialize()
+    serialize_seconds = time.perf_counter() - start
+
+    points = len(result) if isinstance(result, list) else len(result['lat'])
+    queue.put({
+        'path': path,
+        'seconds': best,
+        'points': points,
+        'records_per_s': len(data) / RECORD_SIZE / best if best else None,
+        'mb_per_s': len(data) / 1e6 / best if best else None,
+        'serialize_json_seconds': serialize_seconds,
+        'json_bytes': len(body),
+        'peak_rss_bytes': peak_rss(),
+    })
+
+
+def compare(results, baseline, tolerance):
+    """Returns messages for paths whose records/s fell more than tolerance below the baseline."""
+    previous = {result['path']: result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(result['path'])
+        if not before or not before.get('records_per_s') or not result.get('records_per_s'):
+            continue
+        ratio = result['records_per_s'] / before['records_per_s']
+        if ratio < 1 - tolerance:
+            regressions.append(
+                f"{result['path']}: {result['records_per_s']:.0f} records/s, "
+                f"{(1 - ratio) * 100:.1f}% below baseline {before['records_per_s']:.0f}"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=1_000_000, help='records in the synthetic capture')
+    parser.add_argument('--a-ratio', type=float, default=0.5, help='share of Signal A among known records')
+    parser.add_argument('--unknown', type=float, default=0.0, help='share of records with unknown sync words')
+    parser.add_argument('--misaligned', type=float, default=0.0,
+                        help='share of record boundaries followed by stray bytes')
+    parser.add_argument('--truncate', type=int, default=0, choices=range(RECORD_SIZE),
+                        help='bytes of a partial record at the end')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--paths', default='reference,columns,stream,resync',
+                        help=f"comma-separated decode paths out of {', '.join(PATHS)}")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processes for the parallel path')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per path; the fastest is reported')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed records/s drop against the baseline')
+    args = parser.parse_args(argv)
+
+    paths = [path for path in args.paths.split(',') if path]
+    unknown_paths = set(paths) - set(PATHS)
+    if unknown_paths:
+        parser.error(f"unknown decode paths: {', '.join(sorted(unknown_paths))}")
+
+    data = generate_capture(args.records, args.a_ratio, args.unknown, args.misaligned, args.truncate, args.seed)
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        capture_path = os.path.join(directory, 'capture.fbf')
+        with open(capture_path, 'wb') as f:
+            f.write(data)
+        for path in paths:
+            queue = context.Queue()
+            process = context.Process(target=run_case, args=(path, capture_path, args.repeat, args.workers, queue))
+            process.start()
+            while True:
+                try:
+                    result = queue.get(timeout=1)
+                    break
+                except Empty:
+                    if not process.is_alive():
+                        raise RuntimeError(f"The {path} benchmark process exited with status {process.exitcode}")
+            process.join()
+            results.append(result)
+            print(f"{path:>10}: {result['records_per_s']:>14,.0f} records/s {result['mb_per_s']:>9.1f} MB/s",
+                  file=sys.stderr)
+
+    report = {
+        'capture': {
+            'records': args.records,
+            'bytes': len(data),
+            'a_ratio': args.a_ratio,
+            'unknown': args.unknown,
+            'misaligned': args.misaligned,
+            'truncate': args.truncate,
+            'seed': args.seed,
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'workers': args.workers,
+        },
+        'results': results,
+    }
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(body + '\n')
+    else:
+        print(body)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
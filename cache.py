@@ -0,0 +1,172 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def content_hash(data):
+    """Hex SHA-256 of a bytes-like object, used to key decoded results."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def columns_nbytes(columns):
+    return sum(column.nbytes for column in columns.values())
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by the total byte size of its values."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        """Stores a value, evicting the oldest entries until the cache fits its budget."""
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            # A value larger than the whole budget is not cached at all
+            if nbytes <= self.max_bytes:
+                self._entries[key] = (value, nbytes)
+                self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                old_key, (old_value, old_nbytes) = self._entries.popitem(last=False)
+                self.bytes -= old_nbytes
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+        # Eviction hooks may do I/O, so they run outside the lock
+        for old_key, old_value in evicted:
+            self.on_evict(old_key, old_value)
+
+    def on_evict(self, key, value):
+        pass
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class ResultCache(LRUCache):
+    """
+    Decoded columns keyed by (content hash, parser registry version).
+
+    Entries evicted from memory are written to spill_dir as .npz files when
+    one is configured, and are loaded back from there on a later miss. The
+    spill files are kept within spill_max_bytes by deleting the least
+    recently used (by mtime, refreshed on every load).
+    """
+    def __init__(self, max_bytes, spill_dir=None, spill_max_bytes=None):
+        super().__init__(max_bytes)
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.disk_hits = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, key):
+        digest, version = key
+        return os.path.join(self.spill_dir, f'{digest}-v{version}.npz')
+
+    def get(self, key):
+        columns = super().get(key)
+        if columns is not None or not self.spill_dir:
+            return columns
+        path = self._spill_path(key)
+        try:
+            with np.load(path) as spilled:
+                columns = {name: spilled[name] for name in spilled.files}
+            os.utime(path)
+        except FileNotFoundError:
+            # Never spilled, or pruned meanwhile
+            return None
+        self.disk_hits += 1
+        self.put_columns(key, columns)
+        return columns
+
+    def __contains__(self, key):
+        # Checks without loading the entry or counting a hit or miss
+        if super().__contains__(key):
+            return True
+        return bool(self.spill_dir) and os.path.exists(self._spill_path(key))
+
+    def put_columns(self, key, columns):
+        # Cached arrays are shared between requests and must never be modified
+        for column in columns.values():
+            column.flags.writeable = False
+        self.put(key, columns, columns_nbytes(columns))
+
+    def on_evict(self, key, columns):
+        if not self.spill_dir:
+            return
+        path = self._spill_path(key)
+        if os.path.exists(path):
+            return
+        # Write under a temporary name so a concurrent reader never sees a partial file
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(temp_path, path)
+        self._prune_spill()
+
+    def _prune_spill(self):
+        """Deletes the least recently used spill files until they fit spill_max_bytes."""
+        if self.spill_max_bytes is None:
+            return
+        files = []
+        with os.scandir(self.spill_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.npz'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.spill_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        stats = super().stats()
+        stats['disk_hits'] = self.disk_hits
+        stats['spill_dir'] = self.spill_dir
+        stats['spill_max_bytes'] = self.spill_max_bytes
+        return stats
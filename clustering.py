@@ -0,0 +1,83 @@
+import numpy as np
+
+# Distances are computed for this many points at a time, so memory stays at
+# CHUNK_ROWS * k floats instead of a full (N, k, 3) tensor
+CHUNK_ROWS = 1 << 16
+# Above this many points, k-means switches to mini-batch updates
+MINIBATCH_THRESHOLD = 200_000
+MINIBATCH_SIZE = 4096
+MINIBATCH_ITERS = 100
+
+
+def assign(points, centroids, chunk_rows=CHUNK_ROWS):
+    """Index of the nearest centroid for each point, computed chunk by chunk."""
+    labels = np.empty(len(points), dtype=np.intp)
+    centroid_sq = (centroids ** 2).sum(axis=1)
+    for start in range(0, len(points), chunk_rows):
+        chunk = points[start:start + chunk_rows]
+        # |p - c|^2 without the |p|^2 term, which is the same for every centroid
+        dists = centroid_sq[None, :] - 2.0 * chunk @ centroids.T
+        labels[start:start + chunk_rows] = np.argmin(dists, axis=1)
+    return labels
+
+
+def _initial_centroids(points, k, rng):
+    return points[rng.choice(len(points), size=k, replace=False)].copy()
+
+
+def kmeans(points, k, iters=10, seed=0):
+    """Lloyd's k-means over an (N, d) array with chunked distance computation."""
+    rng = np.random.RandomState(seed)
+    centroids = _initial_centroids(points, k, rng)
+    for _ in range(iters):
+        labels = assign(points, centroids)
+        counts = np.bincount(labels, minlength=k)
+        for dim in range(points.shape[1]):
+            sums = np.bincount(labels, weights=points[:, dim], minlength=k)
+            # Empty clusters keep their previous centroid
+            np.divide(sums, counts, out=centroids[:, dim], where=counts > 0)
+    return labels
+
+
+def minibatch_kmeans(points, k, iters=MINIBATCH_ITERS, batch_size=MINIBATCH_SIZE, seed=0):
+    """
+    Mini-batch k-means (Sculley 2010) for large N.
+
+    Each iteration moves the centroids towards a random sample of points with
+    a per-centroid learning rate of 1 / points seen so far. Only the final
+    assignment touches every point.
+    """
+    rng = np.random.RandomState(seed)
+    centroids = _initial_centroids(points, k, rng)
+    seen = np.zeros(k)
+    for _ in range(iters):
+        batch = points[rng.randint(0, len(points), size=batch_size)]
+        labels = assign(batch, centroids)
+        counts = np.bincount(labels, minlength=k)
+        seen += counts
+        for dim in range(points.shape[1]):
+            sums = np.bincount(labels, weights=batch[:, dim], minlength=k)
+            step = sums - counts * centroids[:, dim]
+            np.divide(step, seen, out=step, where=seen > 0)
+            centroids[:, dim] += step
+    return assign(points, centroids)
+
+
+def cluster_labels(points, k, seed=0):
+    """
+    Clusters an (N, d) array that may contain NaNs into at most k groups.
+
+    Returns float labels with NaN for rows that have a NaN coordinate.
+    Mini-batch k-means is used above MINIBATCH_THRESHOLD valid rows.
+    """
+    valid = ~np.isnan(points).any(axis=1)
+    labels = np.full(len(points), np.nan)
+    data = points[valid]
+    k = min(k, len(data))
+    if k < 1:
+        return labels
+    if len(data) > MINIBATCH_THRESHOLD:
+        labels[valid] = minibatch_kmeans(data, k, seed=seed)
+    else:
+        labels[valid] = kmeans(data, k, seed=seed)
+    return labels
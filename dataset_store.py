@@ -0,0 +1,190 @@
+import glob
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import ipc
+except ImportError:  # pragma: no cover - the columnar cache is optional
+    pa = None
+
+from cache import LRUCache
+from time_index import TimeIndex
+
+
+def source_id(path):
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+
+def dataset_key(path):
+    """
+    Stable key for a source file: "<source id>-<version>".
+
+    The source id identifies the file by its absolute path and the version
+    its modification time and size, so every edit gets a new key while
+    earlier versions of the same file can still be found by their prefix.
+    """
+    stat = os.stat(path)
+    version = hashlib.sha1(f"{stat.st_mtime_ns}|{stat.st_size}".encode("utf-8")).hexdigest()[:16]
+    return f"{source_id(path)}-{version}"
+
+
+def read_source(path):
+    return (pd.read_excel(path) if path.lower().endswith((".xls", "xlsx"))
+            else pd.read_csv(path))
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class FrameDataset:
+    """A source file held in memory as one DataFrame, when it can't go through the columnar cache."""
+    def __init__(self, df):
+        self.df = df
+        self.columns = list(df.columns)
+        self.num_rows = len(df)
+        self.nbytes = frame_nbytes(df)
+
+
+class ColumnarDataset:
+    """
+    A source file converted to an uncompressed Arrow IPC (Feather v2) file.
+
+    The schema and row count are read from the file footer; each column is
+    read on demand through a memory map, so only the columns a callback uses
+    are ever paged in.
+    """
+    nbytes = 0
+
+    def __init__(self, path):
+        self.path = path
+        with pa.memory_map(path) as source:
+            reader = ipc.open_file(source)
+            self.columns = reader.schema.names
+            self.num_rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+    def read(self, name):
+        with pa.memory_map(self.path) as source:
+            return ipc.open_file(source).read_all().column(name).to_pandas().rename(name)
+
+
+def write_columnar(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Write under a temporary name so a concurrent load never maps a partial file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(temp_path, "wb") as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class DatasetStore(LRUCache):
+    """
+    Process-level cache of loaded datasets for the 3D dashboard.
+
+    The browser-side dcc.Store only holds the dataset key. Each source file
+    is converted once to a columnar file in cache_dir, named by that key, and
+    callbacks then load only the columns they use, which are cached here by
+    (key, column). Without pyarrow whole DataFrames are cached instead.
+
+    Converting a new version of a source file deletes the columnar files of
+    its earlier versions, so edits don't pile up copies on disk.
+    """
+    def __init__(self, max_bytes, cache_dir=None):
+        super().__init__(max_bytes)
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "geosignal-columnar")
+        if pa is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _columnar_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.arrow")
+
+    def load(self, path):
+        """Opens a source file, converting it to the columnar cache on first use. Returns (key, dataset)."""
+        key = dataset_key(path)
+        dataset = self.get(key)
+        if dataset is not None:
+            return key, dataset
+        if pa is not None and not os.path.exists(self._columnar_path(key)):
+            self._remove_versions(key)
+            df = read_source(path)
+            try:
+                write_columnar(df, self._columnar_path(key))
+            except (pa.ArrowException, ValueError, TypeError):
+                # Columns of mixed types can't be stored as Arrow; keep the frame in memory
+                dataset = FrameDataset(df)
+        elif pa is None:
+            dataset = FrameDataset(read_source(path))
+        if dataset is None:
+            dataset = ColumnarDataset(self._columnar_path(key))
+        self.put(key, dataset, dataset.nbytes)
+        return key, dataset
+
+    def _remove_versions(self, key):
+        """Deletes the columnar files of other versions of the source file behind key."""
+        prefix = key.split("-")[0]
+        for stale in glob.glob(os.path.join(self.cache_dir, f"{prefix}-*.arrow")):
+            if stale != self._columnar_path(key):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    # Still mapped by another process (Windows); the next conversion retries
+                    pass
+
+    def dataset(self, store_data):
+        """Returns the dataset referenced by a df-store value, or None if missing or evicted."""
+        if not store_data or "key" not in store_data:
+            return None
+        key = store_data["key"]
+        dataset = self.get(key)
+        if isinstance(dataset, ColumnarDataset) and not os.path.exists(dataset.path):
+            # Superseded by a newer version of its source file
+            return None
+        if dataset is None and pa is not None and os.path.exists(self._columnar_path(key)):
+            # Still on disk from an earlier session or after eviction
+            dataset = ColumnarDataset(self._columnar_path(key))
+            self.put(key, dataset, dataset.nbytes)
+        return dataset
+
+    def frame(self, store_data, columns):
+        """
+        Returns a DataFrame holding the given columns of a dataset, or None.
+
+        Unknown and repeated column names are ignored.
+        """
+        dataset = self.dataset(store_data)
+        if dataset is None:
+            return None
+        key = store_data["key"]
+        names = [name for name in dict.fromkeys(columns) if name in dataset.columns]
+        if isinstance(dataset, FrameDataset):
+            return dataset.df[names]
+        series = []
+        for name in names:
+            column = self.get((key, name))
+            if column is None:
+                column = dataset.read(name)
+                self.put((key, name), column, int(column.memory_usage(index=True, deep=True)))
+            series.append(column)
+        if not series:
+            return pd.DataFrame(index=pd.RangeIndex(dataset.num_rows))
+        return pd.concat(series, axis=1)
+
+    def time_index(self, store_data, column):
+        """Returns the TimeIndex of a dataset's time column, building it on first use, or None."""
+        dataset = self.dataset(store_data)
+        if dataset is None or column not in dataset.columns:
+            return None
+        index = self.get((store_data["key"], column, "time"))
+        if index is None:
+            index = TimeIndex(self.frame(store_data, [column])[column])
+            self.put((store_data["key"], column, "time"), index, index.nbytes)
+        return index
@@ -0,0 +1,307 @@
+import binascii
+import mmap
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+from parsers import registry
+
+# Every record in a capture is a fixed 16 bytes, starting with a 2-byte sync word
+RECORD_SIZE = 16
+
+
+def record_view(data):
+    """Returns a zero-copy (N, 16) uint8 view over the complete records in data."""
+    count = len(data) // RECORD_SIZE
+    flat = np.frombuffer(data, dtype=np.uint8, count=count * RECORD_SIZE)
+    return flat.reshape(count, RECORD_SIZE)
+
+
+def sync_words(records):
+    """Reads the big-endian sync word of every record in an (N, 16) view."""
+    return (records[:, 0].astype(np.uint16) << 8) | records[:, 1]
+
+
+def decode_rows(records, parsers=registry):
+    """
+    Decodes every row of an (N, 16) view without filtering.
+
+    Returns (codes, lat, lng): codes is the int16 type code per row, -1 for an
+    unknown sync word, in which case lat and lng are NaN.
+    """
+    codes = parsers.lookup_table()[sync_words(records)]
+
+    lat = np.full(len(records), np.nan)
+    lng = np.full(len(records), np.nan)
+
+    for code, parser in enumerate(parsers.parsers.values()):
+        rows = np.flatnonzero(codes == code)
+        if not len(rows):
+            continue
+        decoded = parser.parse_batch(records, rows)
+        lat[rows] = decoded['lat']
+        lng[rows] = decoded['lng']
+
+    return codes, lat, lng
+
+
+def decode_columns(data, parsers=registry):
+    """
+    Decodes a byte string of 16-byte records in one vectorized pass.
+
+    Every record's sync word is mapped to a type code through the parser
+    registry's lookup table, then each registered parser decodes all of its
+    rows at once. Returns a dict of equal-length arrays in record order:
+    'lat' and 'lng' (float64) and 'type' (uint8 index into the registry's
+    labels). Records with an unknown sync word and a trailing partial record
+    are dropped, matching parse_binary_data.
+    """
+    codes, lat, lng = decode_rows(record_view(data), parsers)
+    known = codes >= 0
+    return {'lat': lat[known], 'lng': lng[known], 'type': codes[known].astype(np.uint8)}
+
+
+def empty_columns():
+    return {
+        'lat': np.empty(0, dtype=np.float64),
+        'lng': np.empty(0, dtype=np.float64),
+        'type': np.empty(0, dtype=np.uint8),
+    }
+
+
+def concat_columns(parts):
+    """Joins a sequence of column dicts end to end."""
+    parts = list(parts)
+    if not parts:
+        return empty_columns()
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def columns_to_records(columns, parsers=registry):
+    """Expands columnar results into the list of point dicts the API returns."""
+    type_labels = parsers.labels()
+    labels = [type_labels[code] for code in columns['type'].tolist()]
+    return [
+        {'lat': lat, 'lng': lng, 'type': label}
+        for lat, lng, label in zip(columns['lat'].tolist(), columns['lng'].tolist(), labels)
+    ]
+
+
+def capture_stats(data, columns, parsers=registry):
+    """
+    Summarizes how the records of a capture decoded.
+
+    Returns a dict with 'sync_words', the record count per sync word seen
+    (as '0x2020' style keys, registered or not), 'unknown', the records
+    whose sync word isn't registered, 'malformed', the decoded records in
+    columns whose lat/lon is non-finite or out of range, and
+    'trailing_bytes', the size of a partial record at the end.
+    """
+    counts = np.bincount(sync_words(record_view(data)), minlength=0x10000)
+    words = np.flatnonzero(counts)
+    known = parsers.lookup_table()[words] >= 0
+    malformed = ~plausible(columns['type'], columns['lat'], columns['lng'])
+    return {
+        'sync_words': {f'0x{word:04x}': int(counts[word]) for word in words.tolist()},
+        'unknown': int(counts[words[~known]].sum()),
+        'malformed': int(malformed.sum()),
+        'trailing_bytes': len(data) % RECORD_SIZE,
+    }
+
+
+@contextmanager
+def map_capture(path):
+    """
+    Memory-maps a capture file read-only.
+
+    Yields the mmap, or b'' for an empty file (which cannot be mapped). Any
+    views taken over it must be released before the block exits.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+# Read size for streamed uploads; a multiple of RECORD_SIZE so blocks stay aligned
+STREAM_BLOCK_SIZE = 1 << 20
+
+
+def iter_decode_stream(stream, block_size=STREAM_BLOCK_SIZE, parsers=registry):
+    """
+    Reads a binary stream in record-aligned blocks and yields decoded columns.
+
+    A partial record at the end of a block is carried over and completed by
+    the next read, so memory use is bounded by the block size however large
+    the stream is. A partial record left at end of stream is dropped.
+    """
+    carry = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        if carry:
+            block = carry + block
+        usable = len(block) - len(block) % RECORD_SIZE
+        carry = block[usable:]
+        if usable:
+            yield decode_columns(memoryview(block)[:usable], parsers)
+
+
+class HexDecodeError(ValueError):
+    """Raised for hex text that doesn't decode; offset is the byte position of the offending character."""
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+_HEX_WHITESPACE = b' \t\n\r\x0b\x0c'
+_HEX_DIGITS = frozenset(b'0123456789abcdefABCDEF')
+# Bytes allowed in hex text: digits and whitespace
+_HEX_ALLOWED = np.zeros(256, dtype=bool)
+_HEX_ALLOWED[list(_HEX_DIGITS) + list(_HEX_WHITESPACE)] = True
+
+
+def _invalid_hex(text, consumed):
+    position = int(np.argmin(_HEX_ALLOWED[np.frombuffer(text, dtype=np.uint8)]))
+    return HexDecodeError(
+        f"Invalid hex character {bytes(text[position:position + 1])!r} at byte offset {consumed + position}.",
+        consumed + position)
+
+
+def iter_unhex(stream, block_size=STREAM_BLOCK_SIZE):
+    """
+    Reads hex text from a binary stream in blocks and yields the bytes it encodes.
+
+    ASCII whitespace anywhere (space, tab, newline, carriage return, vertical
+    tab and form feed) is skipped, and a digit left unpaired at the end of a
+    block is paired with the first digit of the next, so memory use is
+    bounded by the block size. Raises
+    HexDecodeError at the first character that is neither a hex digit nor
+    whitespace, or at the last digit if there is an odd number of them.
+    """
+    consumed = 0
+    pending = b''
+    last_digit = None
+    while True:
+        text = stream.read(block_size)
+        if not text:
+            break
+        digits = pending + text.translate(None, _HEX_WHITESPACE)
+        paired = len(digits) - len(digits) % 2
+        try:
+            decoded = binascii.unhexlify(memoryview(digits)[:paired])
+        except binascii.Error:
+            raise _invalid_hex(text, consumed) from None
+        pending = digits[paired:]
+        if pending:
+            if pending[0] not in _HEX_DIGITS:
+                raise _invalid_hex(text, consumed)
+            # A block of only whitespace leaves the digit where it was
+            content = len(text.rstrip(_HEX_WHITESPACE))
+            if content:
+                last_digit = consumed + content - 1
+        consumed += len(text)
+        if decoded:
+            yield decoded
+    if pending:
+        raise HexDecodeError(
+            f"Odd number of hex digits: the last one, at byte offset {last_digit}, has no pair.", last_digit)
+
+
+# Resync scans for sync words in byte windows that start small, since the next
+# record is usually close by, and double up to the maximum
+RESYNC_MIN_SCAN_BYTES = 1 << 12
+RESYNC_MAX_SCAN_BYTES = 1 << 20
+# Aligned runs are validated in windows that start small after each resync and
+# double while the data stays clean, so dense corruption costs little rework
+RESYNC_MIN_RECORDS = 64
+RESYNC_MAX_RECORDS = 1 << 16
+
+
+def plausible(codes, lat, lng):
+    """Rows with a known sync word and coordinates inside the valid lat/lon range."""
+    with np.errstate(invalid='ignore'):
+        return (codes >= 0) & (np.abs(lat) <= 90) & (np.abs(lng) <= 180)
+
+
+def find_sync(buffer, start, parsers=registry):
+    """
+    Returns the first offset at or after start where a plausible record begins.
+
+    Candidates are byte offsets holding a registered sync word whose decoded
+    lat/lon is in range. A candidate is only accepted if the record right
+    after it is also plausible (or it is the last whole record), which rules
+    out sync-word lookalikes inside coordinate bytes. Returns len(buffer) if
+    no record is found.
+    """
+    total = len(buffer)
+    lookup = parsers.lookup_table()
+    offsets = np.arange(RECORD_SIZE)
+    scan = RESYNC_MIN_SCAN_BYTES
+    while start + RECORD_SIZE <= total:
+        # Extend each window by two records so candidates near its end can be confirmed
+        stop = min(start + scan + 2 * RECORD_SIZE, total)
+        window = buffer[start:stop]
+        words = (window[:-1].astype(np.uint16) << 8) | window[1:]
+        candidates = np.flatnonzero(lookup[words] >= 0)
+        candidates = candidates[candidates + RECORD_SIZE <= len(window)]
+        if len(candidates):
+            records = window[candidates[:, None] + offsets]
+            valid = candidates[plausible(*decode_rows(records, parsers))]
+            whole_end = total - start - RECORD_SIZE
+            confirmed = np.isin(valid + RECORD_SIZE, valid) | (valid + RECORD_SIZE > whole_end)
+            # Anything confirmed past the scan window is found again by the next window
+            confirmed &= valid < scan
+            if confirmed.any():
+                return start + int(valid[confirmed][0])
+        start += scan
+        scan = min(scan * 2, RESYNC_MAX_SCAN_BYTES)
+    return total
+
+
+def decode_resync(data, parsers=registry):
+    """
+    Decodes a capture that may contain dropped, inserted or corrupt bytes.
+
+    Records are decoded in aligned runs for as long as each one has a known
+    sync word and a plausible lat/lon. When a record fails, the stream is
+    resynchronized at the next confirmed sync word found by find_sync().
+    Returns (columns, skipped) where skipped lists the (start, end) byte
+    ranges that were not decoded, including a trailing partial record.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    total = len(buffer)
+    parts = []
+    skipped = []
+    pos = 0
+    window = RESYNC_MIN_RECORDS
+
+    while pos + RECORD_SIZE <= total:
+        count = min(window, (total - pos) // RECORD_SIZE)
+        records = buffer[pos:pos + count * RECORD_SIZE].reshape(count, RECORD_SIZE)
+        codes, lat, lng = decode_rows(records, parsers)
+        bad = np.flatnonzero(~plausible(codes, lat, lng))
+        good = int(bad[0]) if len(bad) else count
+
+        if good:
+            parts.append({
+                'lat': lat[:good],
+                'lng': lng[:good],
+                'type': codes[:good].astype(np.uint8),
+            })
+            pos += good * RECORD_SIZE
+            window = min(window * 2, RESYNC_MAX_RECORDS)
+            continue
+
+        resume = find_sync(buffer, pos + 1, parsers)
+        skipped.append((pos, resume))
+        pos = resume
+        window = RESYNC_MIN_RECORDS
+
+    if pos < total:
+        skipped.append((pos, total))
+    return concat_columns(parts), skipped
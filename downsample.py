@@ -0,0 +1,131 @@
+import math
+
+import numpy as np
+
+# Points sent to the browser per trace, so WebGL load and figure size are
+# bounded by this rather than by the dataset
+DEFAULT_POINT_BUDGET = 200_000
+# The voxel grid starts at the cube root of the budget per axis and grows by
+# half at each step while the occupied voxels still fit the budget
+MAX_GRID_STEPS = 10
+# Each camera zoom tier halves the size of the refined view box
+MAX_VIEW_TIER = 6
+# Distance from the eye to the look-at point of plotly's default 3D camera
+DEFAULT_EYE_DISTANCE = 1.25 * math.sqrt(3)
+
+
+def voxel_ids(points, lo, hi, cells):
+    """Flat voxel number of each point in a cells^3 grid spanning lo..hi."""
+    span = np.where(hi > lo, hi - lo, 1.0)
+    cell = np.clip(((points - lo) / span * cells).astype(np.int64), 0, cells - 1)
+    return (cell[:, 0] * cells + cell[:, 1]) * cells + cell[:, 2]
+
+
+def extreme_rows(points, values=None):
+    """Positions of the minimum and maximum of every coordinate, and of values when given."""
+    columns = [points[:, dim] for dim in range(points.shape[1])]
+    if values is not None:
+        columns.append(values)
+    rows = []
+    for column in columns:
+        if np.isnan(column).all():
+            continue
+        rows.extend((np.nanargmin(column), np.nanargmax(column)))
+    return np.unique(np.asarray(rows, dtype=np.intp))
+
+
+def voxel_sample(points, budget, labels=None, values=None, box=None):
+    """
+    Row positions of a shape-preserving sample of an (N, 3) point array.
+
+    Keeps the first point of every occupied voxel, on the finest grid whose
+    occupied voxels fit in budget. With labels (e.g. cluster IDs) voxels are
+    split per label, so every cluster keeps representatives wherever it
+    appears. The extremes of each axis and of values are always kept, which
+    may add a few points over the budget, as does keeping one point per
+    label when there are more labels than budget. Rows with NaN coordinates, and
+    rows outside box ((lo, hi) corners) when given, are left out. Returns
+    sorted positions, so track order is preserved.
+    """
+    valid = ~np.isnan(points).any(axis=1)
+    if box is not None:
+        valid &= np.all((points >= box[0]) & (points <= box[1]), axis=1)
+    rows = np.flatnonzero(valid)
+    if len(rows) <= budget:
+        return rows
+
+    pts = points[rows]
+    lo, hi = pts.min(axis=0), pts.max(axis=0)
+    groups, n_groups = None, 1
+    if labels is not None:
+        _, groups = np.unique(np.nan_to_num(labels[rows], nan=-1), return_inverse=True)
+        n_groups = int(groups.max()) + 1
+
+    # cells^3 * n_groups <= budget, so the first grid fits unless there are
+    # more groups than the budget; then each group keeps one representative
+    cells = max(int(np.cbrt(budget / n_groups)), 1)
+    keep = np.unique(groups, return_index=True)[1] if groups is not None else np.empty(0, dtype=np.intp)
+    for _ in range(MAX_GRID_STEPS + 1):
+        ids = voxel_ids(pts, lo, hi, cells)
+        if groups is not None:
+            ids = ids * n_groups + groups
+        _, first = np.unique(ids, return_index=True)
+        if len(first) > budget:
+            break
+        keep = first
+        if len(first) == len(rows):
+            break
+        cells = int(math.ceil(cells * 1.5))
+
+    extremes = extreme_rows(pts, values[rows] if values is not None else None)
+    return rows[np.union1d(keep, extremes)]
+
+
+def camera_view(camera):
+    """
+    Reduces a plotly scene camera to a view tier and a quantized look-at point.
+
+    The tier is how many times the camera has been zoomed in by a factor of
+    two from the default distance. Returns None at tier 0, where the whole
+    cloud is in view.
+    """
+    eye = camera.get("eye") or {}
+    center = camera.get("center") or {}
+    eye = np.array([eye.get(axis, 1.25) for axis in "xyz"], dtype=float)
+    center = np.array([center.get(axis, 0.0) for axis in "xyz"], dtype=float)
+    distance = np.linalg.norm(eye - center)
+    if not distance:
+        return None
+    tier = min(int(math.floor(math.log2(DEFAULT_EYE_DISTANCE / distance))), MAX_VIEW_TIER)
+    if tier < 1:
+        return None
+    # Snap the look-at point to a grid finer than the view box, so small pans
+    # reuse the same sample
+    step = 1.0 / 2 ** (tier + 1)
+    return {"tier": tier, "center": (np.round(center / step) * step).tolist()}
+
+
+def lod_rows(points, budget=DEFAULT_POINT_BUDGET, view=None, labels=None, values=None):
+    """
+    Row positions to plot for an (N, 3) point array within a point budget.
+
+    Without a view the sample covers the whole cloud. With a view from
+    camera_view(), half the budget goes to a coarse sample of the whole
+    cloud and half to a finer one inside the zoomed view box. Camera
+    coordinates are taken relative to the data box, whose half-extent is 1
+    in each axis, which matches plotly's default cube aspect.
+    """
+    if view is None:
+        return voxel_sample(points, budget, labels, values)
+
+    valid = ~np.isnan(points).any(axis=1)
+    if not valid.any():
+        return np.flatnonzero(valid)
+    lo, hi = points[valid].min(axis=0), points[valid].max(axis=0)
+    half = (hi - lo) / 2
+    middle = lo + half + np.asarray(view["center"]) * half
+    extent = half / 2 ** view["tier"]
+    coarse = voxel_sample(points, budget // 2, labels, values)
+    fine = voxel_sample(points, budget - budget // 2, labels, values,
+                        box=(middle - extent, middle + extent))
+    return np.union1d(coarse, fine)
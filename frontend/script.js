@@ -83,6 +83,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const processFileBtn = document.getElementById('processFileBtn');
     const hexInput = document.getElementById('hexInput');
     const processHexBtn = document.getElementById('processHexBtn');
+    const livePathInput = document.getElementById('livePathInput');
+    const followLiveBtn = document.getElementById('followLiveBtn');
     const clearBtn = document.getElementById('clearBtn');
     const resultsDiv = document.getElementById('results');
     const signalTypeSpan = document.getElementById('signalType');
@@ -103,9 +105,32 @@ document.addEventListener('DOMContentLoaded', () => {
     let processedData = [];
     let layerGroups = {};
 
+    // Above this many points the map shows server-side clusters for the
+    // visible area instead of one marker per point
+    const CLUSTER_THRESHOLD = 20000;
+    // Content hash of the last decoded dataset, used for the cluster endpoint
+    let currentDatasetHash = null;
+    let clusterLayer = null;
+    let clusterRequestId = 0;
+    // From this zoom in, large datasets are drawn from server-side point tiles
+    const POINT_TILE_MIN_ZOOM = 8;
+    let pointTileLayer = null;
+    // Signal tracks simplified server-side to the level of detail of the zoom
+    let trackLayer = null;
+    let trackRequestId = 0;
+    // Levels of detail stop at this zoom (LOD_MAX_ZOOM in simplify.py); past
+    // it the server would send every point, so the finest level is kept
+    const TRACK_MAX_ZOOM = 18;
+    // Simplified track points last fetched, and the level they were fetched for
+    let trackPoints = [];
+    let trackZoom = null;
+    // Event stream of the capture being followed live, if any
+    let liveSource = null;
+
     const helpContent = {
         'help-file': 'Upload a .sff or .fbf file containing signal data. The file will be processed to extract and display geographical coordinates.',
-        'help-hex': 'Paste the hexadecimal representation of the signal data here. This is an alternative to uploading a file.'
+        'help-hex': 'Paste the hexadecimal representation of the signal data here. This is an alternative to uploading a file.',
+        'help-live': 'Enter the path of a capture that is still being recorded, relative to the server\'s data directory. New signals are added to the map as they are written.'
     };
 
     document.querySelectorAll('.help-icon').forEach(icon => {
@@ -147,11 +172,31 @@ document.addEventListener('DOMContentLoaded', () => {
     }).addTo(map);
 
     // --- UI Functions ---
-    function clearMap() {
+    function removeMarkers() {
         for (const type in layerGroups) {
             layerGroups[type].forEach(layer => map.removeLayer(layer));
         }
         layerGroups = {};
+    }
+
+    function createMarker(point) {
+        const marker = L.circleMarker([point.lat, point.lng], {
+            radius: 5,
+            fillColor: SIGNAL_COLORS[point.type] || 'grey',
+            color: '#000',
+            weight: 1,
+            opacity: 1,
+            fillOpacity: 0.8
+        });
+        marker.bindTooltip(`Lat: ${point.lat.toFixed(5)}, Lng: ${point.lng.toFixed(5)}`);
+        marker.bindPopup(`<b>Signal ${point.type}</b><br>Lat: ${point.lat.toFixed(5)}<br>Lng: ${point.lng.toFixed(5)}`);
+        return marker;
+    }
+
+    function clearMap() {
+        stopLive();
+        removeMarkers();
+        stopClusters();
         
         resultsDiv.textContent = 'No data processed yet.';
         signalTypeSpan.textContent = 'N/A';
@@ -184,6 +229,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 checkbox.checked = true;
 
                 checkbox.addEventListener('change', (event) => {
+                    if (clusterLayer) {
+                        refreshClusters();
+                        refreshTracks();
+                        pointTileLayer.redraw();
+                        return;
+                    }
                     const signalType = event.target.value;
                     const layers = layerGroups[signalType] || [];
                     if (event.target.checked) {
@@ -347,29 +398,29 @@ document.addEventListener('DOMContentLoaded', () => {
         const detectedTypes = Object.keys(signalTypes);
         signalTypeSpan.textContent = detectedTypes.join(', ');
 
+        if (data.length > CLUSTER_THRESHOLD && currentDatasetHash) {
+            showClusters(data);
+            resultsDiv.textContent = `Processed ${data.length} data points. Found signal types: ${detectedTypes.join(', ')}. Showing clusters for the visible area.`;
+            data.slice(0, LIST_LIMIT).forEach(point => {
+                const li = document.createElement('li');
+                li.textContent = `Type: ${point.type}, Lat: ${point.lat.toFixed(5)}, Lng: ${point.lng.toFixed(5)}`;
+                coordinatesList.appendChild(li);
+            });
+            const li = document.createElement('li');
+            li.textContent = `... and ${data.length - LIST_LIMIT} more (use Export as CSV for the full list)`;
+            coordinatesList.appendChild(li);
+            return;
+        }
+
         const allPoints = [];
-        const colors = { 'A': 'blue', 'B': 'red' };
 
         for (const type in signalTypes) {
             layerGroups[type] = [];
             const points = signalTypes[type];
             if (points.length > 0) {
                 points.forEach(point => {
-                    const latLng = [point.lat, point.lng];
-                    allPoints.push(latLng);
-                    const marker = L.circleMarker(latLng, {
-                        radius: 5,
-                        fillColor: colors[type] || 'grey',
-                        color: '#000',
-                        weight: 1,
-                        opacity: 1,
-                        fillOpacity: 0.8
-                    }).addTo(map);
-                    
-                    marker.bindTooltip(`Lat: ${point.lat.toFixed(5)}, Lng: ${point.lng.toFixed(5)}`);
-                    marker.bindPopup(`<b>Signal ${type}</b><br>Lat: ${point.lat.toFixed(5)}<br>Lng: ${point.lng.toFixed(5)}`);
-                    
-                    layerGroups[type].push(marker);
+                    allPoints.push([point.lat, point.lng]);
+                    layerGroups[type].push(createMarker(point).addTo(map));
                 });
             }
         }
@@ -388,6 +439,240 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
     
+    // --- Server-side Clusters and Point Tiles ---
+    const SIGNAL_COLORS = { 'A': 'blue', 'B': 'red' };
+    // Coordinates listed under the results when the map is in cluster mode
+    const LIST_LIMIT = 1000;
+
+    function showClusters(data) {
+        // Fit the map with a single pass instead of building a LatLng per point
+        let south = 90, west = 180, north = -90, east = -180;
+        data.forEach(point => {
+            south = Math.min(south, point.lat);
+            north = Math.max(north, point.lat);
+            west = Math.min(west, point.lng);
+            east = Math.max(east, point.lng);
+        });
+        clusterLayer = L.layerGroup().addTo(map);
+        pointTileLayer = new PointTileLayer({ minZoom: POINT_TILE_MIN_ZOOM }).addTo(map);
+        trackLayer = L.layerGroup().addTo(map);
+        map.on('moveend', refreshClusters);
+        map.on('zoomend', refreshTracks);
+        map.fitBounds(L.latLngBounds([south, west], [north, east]).pad(0.1));
+        // fitBounds only fires moveend if the view actually changed
+        refreshClusters();
+        refreshTracks();
+    }
+
+    function stopClusters() {
+        if (clusterLayer) {
+            map.off('moveend', refreshClusters);
+            map.off('zoomend', refreshTracks);
+            map.removeLayer(clusterLayer);
+            map.removeLayer(pointTileLayer);
+            map.removeLayer(trackLayer);
+            clusterLayer = null;
+            pointTileLayer = null;
+            trackLayer = null;
+            trackPoints = [];
+            trackZoom = null;
+        }
+    }
+
+    async function refreshTracks() {
+        if (!trackLayer) return;
+        const requestId = ++trackRequestId;
+        const zoom = Math.min(map.getZoom(), TRACK_MAX_ZOOM);
+        try {
+            // Type filter changes and zooming past the finest level redraw what's already here
+            if (zoom !== trackZoom) {
+                const points = await fetchPoints(`/results/${currentDatasetHash}?lod=${zoom}`);
+                if (requestId !== trackRequestId || !trackLayer) return;
+                trackPoints = points;
+                trackZoom = zoom;
+            }
+
+            const checkboxes = Array.from(filterCheckboxes.querySelectorAll('input[type=checkbox]'));
+            const hidden = new Set(checkboxes.filter(box => !box.checked).map(box => box.value));
+            const tracks = {};
+            trackPoints.forEach(point => {
+                if (!hidden.has(point.type)) {
+                    (tracks[point.type] = tracks[point.type] || []).push([point.lat, point.lng]);
+                }
+            });
+
+            trackLayer.clearLayers();
+            for (const type in tracks) {
+                L.polyline(tracks[type], { color: SIGNAL_COLORS[type] || 'grey', weight: 2, opacity: 0.6 }).addTo(trackLayer);
+            }
+        } catch (error) {
+            console.error('Error loading tracks:', error);
+        }
+    }
+
+    function typeFilterParams(params = new URLSearchParams()) {
+        const checkboxes = filterCheckboxes.querySelectorAll('input[type=checkbox]');
+        if (checkboxes.length > 0) {
+            params.set('types', Array.from(checkboxes).filter(box => box.checked).map(box => box.value).join(','));
+        }
+        return params;
+    }
+
+    // Draws each 256px tile of points onto a canvas, so Leaflet only loads
+    // and renders the tiles in view rather than the whole dataset
+    const PointTileLayer = L.GridLayer.extend({
+        createTile(coords, done) {
+            const tile = document.createElement('canvas');
+            const size = this.getTileSize();
+            tile.width = size.x;
+            tile.height = size.y;
+
+            const url = `/data_tiles/${currentDatasetHash}/${coords.z}/${coords.x}/${coords.y}.bin?${typeFilterParams()}`;
+            fetch(url)
+                .then(response => {
+                    if (!response.ok) throw new Error(`Tile request failed (${response.status})`);
+                    return response.arrayBuffer();
+                })
+                .then(buffer => {
+                    const ctx = tile.getContext('2d');
+                    const origin = coords.scaleBy(size);
+                    decodeColumnsPayload(buffer).forEach(point => {
+                        const pixel = map.project([point.lat, point.lng], coords.z).subtract(origin);
+                        ctx.fillStyle = SIGNAL_COLORS[point.type] || 'grey';
+                        ctx.beginPath();
+                        ctx.arc(pixel.x, pixel.y, 3, 0, 2 * Math.PI);
+                        ctx.fill();
+                    });
+                    done(null, tile);
+                })
+                .catch(error => done(error, tile));
+            return tile;
+        }
+    });
+
+    async function refreshClusters() {
+        if (!clusterLayer) return;
+        const requestId = ++clusterRequestId;
+        // Point tiles take over once zoomed in
+        if (map.getZoom() >= POINT_TILE_MIN_ZOOM) {
+            clusterLayer.clearLayers();
+            return;
+        }
+        const bounds = map.getBounds();
+        const params = typeFilterParams(new URLSearchParams({
+            bbox: [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()].join(','),
+            zoom: map.getZoom()
+        }));
+
+        try {
+            const response = await fetch(`/clusters/${currentDatasetHash}?${params}`);
+            if (!response.ok) throw new Error(`Cluster request failed (${response.status})`);
+            const result = await response.json();
+            // Drop responses that arrive after a newer pan/zoom or a cleared map
+            if (requestId !== clusterRequestId || !clusterLayer) return;
+
+            clusterLayer.clearLayers();
+            result.clusters.forEach(cluster => {
+                const types = Object.keys(cluster.types);
+                const dominant = types.reduce((a, b) => cluster.types[a] >= cluster.types[b] ? a : b);
+                const breakdown = types.map(type => `Signal ${type}: ${cluster.types[type]}`).join('<br>');
+                L.circleMarker([cluster.lat, cluster.lng], {
+                    radius: cluster.count === 1 ? 5 : 6 + Math.log2(cluster.count) * 1.5,
+                    fillColor: SIGNAL_COLORS[dominant] || 'grey',
+                    color: '#000',
+                    weight: 1,
+                    opacity: 1,
+                    fillOpacity: 0.7
+                })
+                    .bindTooltip(`${cluster.count} point${cluster.count === 1 ? '' : 's'}`)
+                    .bindPopup(`<b>${cluster.count} points</b><br>${breakdown}`)
+                    .addTo(clusterLayer);
+            });
+        } catch (error) {
+            console.error('Error loading clusters:', error);
+        }
+    }
+
+    // --- Live Capture Following ---
+    // Records appended to a server-side capture arrive as server-sent events
+    // and are added to the existing layers, so nothing already drawn is redrawn
+    function followLive(path) {
+        clearMap();
+        livePathInput.value = path;
+        followLiveBtn.textContent = 'Stop';
+        resultsDiv.textContent = `Following ${path}, waiting for signals...`;
+        signalTypeSpan.textContent = 'Listening...';
+
+        const source = new EventSource(`/tail_path?${new URLSearchParams({ path })}`);
+        liveSource = source;
+        source.addEventListener('points', event => {
+            appendLivePoints(path, JSON.parse(event.data).points);
+        });
+        source.addEventListener('reset', () => {
+            // The capture was truncated or replaced and is being read from the start again
+            removeMarkers();
+            filterContainer.classList.add('hidden');
+            filterCheckboxes.innerHTML = '';
+            coordinatesList.innerHTML = '';
+            processedData = [];
+        });
+        source.addEventListener('error', () => {
+            // EventSource reconnects by itself after a dropped connection,
+            // resuming after the last event; it only gives up on an error status
+            if (source.readyState === EventSource.CLOSED && liveSource === source) {
+                stopLive();
+                resultsDiv.textContent = `Error: could not follow ${path}. Is it a capture under the data directory?`;
+                signalTypeSpan.textContent = 'Error';
+            }
+        });
+    }
+
+    function stopLive() {
+        if (liveSource) {
+            liveSource.close();
+            liveSource = null;
+        }
+        followLiveBtn.textContent = 'Follow';
+    }
+
+    function appendLivePoints(path, points) {
+        const checkboxes = Array.from(filterCheckboxes.querySelectorAll('input[type=checkbox]'));
+        const hidden = new Set(checkboxes.filter(box => !box.checked).map(box => box.value));
+        const firstBatch = processedData.length === 0;
+        let newType = false;
+
+        points.forEach(point => {
+            if (!layerGroups[point.type]) {
+                layerGroups[point.type] = [];
+                newType = true;
+            }
+            const marker = createMarker(point);
+            if (!hidden.has(point.type)) {
+                marker.addTo(map);
+            }
+            layerGroups[point.type].push(marker);
+            if (processedData.length < LIST_LIMIT) {
+                const li = document.createElement('li');
+                li.textContent = `Type: ${point.type}, Lat: ${point.lat.toFixed(5)}, Lng: ${point.lng.toFixed(5)}`;
+                coordinatesList.appendChild(li);
+            }
+            processedData.push(point);
+        });
+
+        if (newType) {
+            createFilters(layerGroups);
+            filterCheckboxes.querySelectorAll('input[type=checkbox]').forEach(box => {
+                box.checked = !hidden.has(box.value);
+            });
+        }
+        if (firstBatch && points.length > 0) {
+            map.fitBounds(L.latLngBounds(points.map(point => [point.lat, point.lng])).pad(0.1));
+        }
+        const types = Object.keys(layerGroups);
+        signalTypeSpan.textContent = types.join(', ');
+        resultsDiv.textContent = `Following ${path}: ${processedData.length} data points so far. Found signal types: ${types.join(', ')}`;
+    }
+
     function exportToCsv() {
         if (processedData.length === 0) {
             alert('No data to export.');
@@ -421,7 +706,86 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    async function handleDataProcessing(url, body) {
+    // --- Binary Payload Decoding ---
+    // Mirrors pack_columns() in payload.py: a 16-byte header, the type labels,
+    // then lat, lng and type columns that are read as typed arrays in place.
+    const COLUMNS_MIMETYPE = 'application/vnd.geosignal.columns';
+
+    function decodeColumnsPayload(buffer) {
+        const header = new DataView(buffer, 0, 16);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'GSC1') {
+            throw new Error('Unrecognised binary response.');
+        }
+        const coordBytes = header.getUint8(5);
+        const count = header.getUint32(8, true);
+        const labelLength = header.getUint32(12, true);
+        const labels = new TextDecoder().decode(new Uint8Array(buffer, 16, labelLength)).split('\n');
+
+        let offset = 16 + Math.ceil(labelLength / 8) * 8;
+        const FloatArray = coordBytes === 4 ? Float32Array : Float64Array;
+        const lat = new FloatArray(buffer, offset, count);
+        offset += count * coordBytes;
+        const lng = new FloatArray(buffer, offset, count);
+        offset += count * coordBytes;
+        const types = new Uint8Array(buffer, offset, count);
+
+        const points = new Array(count);
+        for (let i = 0; i < count; i++) {
+            points[i] = { lat: lat[i], lng: lng[i], type: labels[types[i]] };
+        }
+        return points;
+    }
+
+    async function fetchPoints(url, options = {}) {
+        // Ask for the packed binary columns; errors still come back as JSON
+        const response = await fetch(url, {
+            ...options,
+            headers: { 'Accept': `${COLUMNS_MIMETYPE}, application/json;q=0.9` }
+        });
+
+        if (!response.ok) {
+            const errorData = await response.json();
+            const error = new Error(errorData.error || 'An unknown error occurred.');
+            error.status = response.status;
+            throw error;
+        }
+
+        currentDatasetHash = response.headers.get('X-Content-Hash');
+        const contentType = response.headers.get('Content-Type') || '';
+        return contentType.startsWith(COLUMNS_MIMETYPE)
+            ? decodeColumnsPayload(await response.arrayBuffer())
+            : await response.json();
+    }
+
+    // SubtleCrypto can only hash a whole buffer, so larger files are uploaded
+    // without checking the server's cache first rather than read into memory
+    const PREHASH_MAX_BYTES = 256 * 1024 * 1024;
+
+    async function hashFile(file) {
+        // SubtleCrypto is only available in secure contexts (https or localhost)
+        if (!window.crypto || !window.crypto.subtle || file.size > PREHASH_MAX_BYTES) {
+            return null;
+        }
+        const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+        return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function fetchCachedResult(file) {
+        // The server keeps decoded captures by content hash, so a file it has
+        // already seen can be fetched without uploading it again.
+        try {
+            const hash = await hashFile(file);
+            if (!hash) return null;
+            // A HEAD probe, so a capture the server hasn't seen doesn't count a cache miss twice
+            const probe = await fetch(`/results/${hash}`, { method: 'HEAD' });
+            return probe.ok ? await fetchPoints(`/results/${hash}`) : null;
+        } catch (error) {
+            return null;
+        }
+    }
+
+    async function handleDataProcessing(url, body, file = null) {
         clearTimeout(titleTimeout);
         document.title = '🛰️ Finding Signals...';
         
@@ -439,17 +803,10 @@ document.addEventListener('DOMContentLoaded', () => {
         loader.classList.remove('hidden');
 
         try {
-            const response = await fetch(url, {
-                method: 'POST',
-                body: body
-            });
-
-            if (!response.ok) {
-                const errorData = await response.json();
-                throw new Error(errorData.error || 'An unknown error occurred.');
+            let data = file ? await fetchCachedResult(file) : null;
+            if (data === null) {
+                data = await fetchPoints(url, { method: 'POST', body: body });
             }
-
-            const data = await response.json();
             processAndDisplayData(data);
 
         } catch (error) {
@@ -472,7 +829,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         const formData = new FormData();
         formData.append('file', file);
-        handleDataProcessing('/process_file', formData);
+        handleDataProcessing('/process_file', formData, file);
     });
 
     processHexBtn.addEventListener('click', () => {
@@ -486,6 +843,19 @@ document.addEventListener('DOMContentLoaded', () => {
         handleDataProcessing('/process_hex', formData);
     });
 
+    followLiveBtn.addEventListener('click', () => {
+        if (liveSource) {
+            stopLive();
+            return;
+        }
+        const path = livePathInput.value.trim();
+        if (!path) {
+            resultsDiv.textContent = 'Please enter the path of a capture to follow.';
+            return;
+        }
+        followLive(path);
+    });
+
     clearBtn.addEventListener('click', clearMap);
     exportCsvBtn.addEventListener('click', exportToCsv);
 
@@ -0,0 +1,60 @@
+import numpy as np
+
+HISTOGRAM_BINS = 30
+# Bin counts are summed in blocks of this many rows, so a window costs two
+# partial blocks of bincount plus one subtraction
+HISTOGRAM_BLOCK_ROWS = 4096
+
+
+class HistogramIndex:
+    """
+    Fixed-edge histogram of one column that can be counted over any time window.
+
+    The edges span the whole column, so every window shares them and only
+    the counts change. Each row's bin is stored in time order (the order of
+    a TimeIndex when given) together with running per-block counts, so the
+    counts for positions lo..hi of that order take O(block + bins) rather
+    than a pass over the window.
+    """
+    def __init__(self, values, time_index=None, bins=HISTOGRAM_BINS):
+        values = np.asarray(values, dtype=np.float64)
+        finite = np.isfinite(values)
+        if finite.any():
+            self.edges = np.histogram_bin_edges(values[finite], bins=bins)
+        else:
+            self.edges = np.linspace(0.0, 1.0, bins + 1)
+        self.bins = bins
+
+        if time_index is not None and time_index.order is not None:
+            values = values[time_index.order]
+        # Bin of each row; non-finite values go to an extra bin that is never reported
+        ids = np.searchsorted(self.edges, values, side="right") - 1
+        ids[values == self.edges[-1]] = bins - 1
+        ids[~np.isfinite(values)] = bins
+        self.ids = ids.astype(np.int16 if bins < 2 ** 15 else np.int64)
+
+        n_blocks = -(-len(ids) // HISTOGRAM_BLOCK_ROWS)
+        block_bins = (np.arange(len(ids)) // HISTOGRAM_BLOCK_ROWS) * (bins + 1) + ids
+        blocks = np.bincount(block_bins, minlength=n_blocks * (bins + 1)).reshape(n_blocks, bins + 1)
+        self.cumulative = np.vstack((np.zeros((1, bins + 1), dtype=np.int64), np.cumsum(blocks, axis=0)))
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.cumulative.nbytes + self.edges.nbytes
+
+    def _partial(self, lo, hi):
+        return np.bincount(self.ids[lo:hi], minlength=self.bins + 1)
+
+    def counts(self, lo=0, hi=None):
+        """Counts per bin for positions lo..hi of the time order (all rows by default)."""
+        hi = len(self.ids) if hi is None else hi
+        if hi <= lo:
+            return np.zeros(self.bins, dtype=np.int64)
+        first = -(-lo // HISTOGRAM_BLOCK_ROWS)
+        last = hi // HISTOGRAM_BLOCK_ROWS
+        if first >= last:
+            return self._partial(lo, hi)[:self.bins]
+        total = (self.cumulative[last] - self.cumulative[first]
+                 + self._partial(lo, first * HISTOGRAM_BLOCK_ROWS)
+                 + self._partial(last * HISTOGRAM_BLOCK_ROWS, hi))
+        return total[:self.bins]
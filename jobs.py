@@ -0,0 +1,203 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue already holds its maximum."""
+
+
+class Job:
+    """
+    One background decode, with progress reported in records.
+
+    Workers call start(), advance() and finish() or fail(); readers take a
+    snapshot() or block in wait() until the job changes. A finished job
+    holds its result, a dict of arrays, itself, so it stays available
+    however busy the result cache is, until the queue forgets the job. The
+    queue may move the result to an .npz file to stay within its budget;
+    load_result() reads it from wherever it is.
+    """
+    def __init__(self, total_records=0):
+        self.id = uuid.uuid4().hex
+        self.state = QUEUED
+        self.total_records = total_records
+        self.records_done = 0
+        self.digest = None
+        self.result = None
+        self.result_nbytes = 0
+        self.result_path = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        # Bumped on every change so waiters can tell whether they missed one
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def _update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def start(self):
+        self._update(state=RUNNING)
+
+    def advance(self, records):
+        with self._changed:
+            self.records_done += records
+            self.version += 1
+            self._changed.notify_all()
+
+    def finish(self, digest, result=None):
+        nbytes = sum(column.nbytes for column in result.values()) if result is not None else 0
+        self._update(state=DONE, digest=digest, result=result, result_nbytes=nbytes, finished=time.time())
+
+    def fail(self, error):
+        self._update(state=FAILED, error=error, finished=time.time())
+
+    @property
+    def is_finished(self):
+        return self.state in (DONE, FAILED)
+
+    def load_result(self):
+        """Returns the result from memory or its spill file, or None once it has been released."""
+        with self._changed:
+            result, path = self.result, self.result_path
+        if result is not None or path is None:
+            return result
+        try:
+            with np.load(path) as spilled:
+                return {name: spilled[name] for name in spilled.files}
+        except FileNotFoundError:
+            # Released while we were reading it
+            return None
+
+    def spill(self, spill_dir):
+        """Moves the result out of memory into an .npz file in spill_dir (None: the system temp directory)."""
+        with self._changed:
+            result = self.result
+        if result is None:
+            return
+        fd, path = tempfile.mkstemp(dir=spill_dir, prefix='job-', suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **result)
+        with self._changed:
+            # The result may have been spilled or released meanwhile
+            if self.result is result:
+                self.result = None
+                self.result_path = path
+                return
+        os.remove(path)
+
+    def release(self):
+        """Drops the result, deleting its spill file if it has one."""
+        with self._changed:
+            path = self.result_path
+            self.result = None
+            self.result_path = None
+        if path is not None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def wait(self, version, timeout):
+        """Blocks until the job has changed since version, or timeout seconds pass. Returns the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def snapshot(self):
+        with self._changed:
+            return {
+                'id': self.id,
+                'state': self.state,
+                'records_total': self.total_records,
+                'records_done': self.records_done,
+                'digest': self.digest,
+                'error': self.error,
+            }
+
+
+class JobQueue:
+    """
+    Runs jobs on a bounded thread pool and keeps them for lookup by ID.
+
+    At most max_workers jobs run at once and at most max_pending are queued
+    or running; submit() raises QueueFull beyond that rather than letting
+    a backlog build up. Finished jobs are forgotten, and their results
+    released, after retention seconds. Results held in memory are limited
+    to max_result_bytes in total; past that the oldest are spilled to .npz
+    files in spill_dir.
+    """
+    def __init__(self, max_workers, max_pending, retention=3600, max_result_bytes=512 * 1024 * 1024, spill_dir=None):
+        self.max_pending = max_pending
+        self.retention = retention
+        self.max_result_bytes = max_result_bytes
+        self.spill_dir = spill_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='decode-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, total_records=0):
+        """Queues fn(job, *args) and returns the new Job. fn must call job.start() and job.finish()."""
+        job = Job(total_records)
+        with self._lock:
+            self._expire()
+            pending = sum(1 for queued in self._jobs.values() if not queued.is_finished)
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs are already queued or running")
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        try:
+            fn(job, *args)
+        except Exception as e:
+            job.fail(str(e))
+        self._trim_results()
+
+    def _trim_results(self):
+        """Spills the oldest finished results until those left in memory fit max_result_bytes."""
+        with self._lock:
+            held = sorted((job for job in self._jobs.values() if job.result is not None), key=lambda job: job.finished)
+        total = sum(job.result_nbytes for job in held)
+        # Files are written outside the lock; Job.spill() copes with races
+        for job in held:
+            if total <= self.max_result_bytes:
+                break
+            job.spill(self.spill_dir)
+            total -= job.result_nbytes
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                # An event stream may still hold the job; its result can go regardless
+                job.release()
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            states = [job.state for job in self._jobs.values()]
+        return {state: states.count(state) for state in (QUEUED, RUNNING, DONE, FAILED)}
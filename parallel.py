@@ -0,0 +1,166 @@
+import mmap
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from decoder import RECORD_SIZE, decode_rows, record_view
+
+# Inputs smaller than this decode faster in-process than it takes to fan out
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+# Each worker gets about this many shards, so a slow worker doesn't hold up the rest
+SHARDS_PER_WORKER = 4
+
+# Per-row output layout in the shared result block: lat, lng, then type code
+_OUTPUT_COLUMNS = (('lat', np.float64), ('lng', np.float64), ('code', np.int16))
+
+
+def _output_arrays(buffer, count):
+    arrays = {}
+    offset = 0
+    for name, dtype in _OUTPUT_COLUMNS:
+        arrays[name] = np.ndarray((count,), dtype=dtype, buffer=buffer, offset=offset)
+        offset += count * np.dtype(dtype).itemsize
+    return arrays
+
+
+def _output_nbytes(count):
+    return sum(count * np.dtype(dtype).itemsize for _, dtype in _OUTPUT_COLUMNS)
+
+
+def _decode_shard(source, count, output_name, first, last):
+    """
+    Worker entry point: decodes records first..last of the source into the shared output.
+
+    source is ('shm', name) for a shared memory copy of the input or
+    ('file', path, offset) for a capture the worker maps itself.
+    """
+    output = shared_memory.SharedMemory(name=output_name)
+    try:
+        if source[0] == 'shm':
+            shared = shared_memory.SharedMemory(name=source[1])
+            mapped = None
+            data = shared.buf
+            base = 0
+        else:
+            shared = None
+            with open(source[1], 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            data = mapped
+            base = source[2]
+        try:
+            with memoryview(data)[base + first * RECORD_SIZE:base + last * RECORD_SIZE] as view:
+                codes, lat, lng = decode_rows(record_view(view))
+                out = _output_arrays(output.buf, count)
+                out['lat'][first:last] = lat
+                out['lng'][first:last] = lng
+                out['code'][first:last] = codes
+                del out
+        finally:
+            if shared is not None:
+                shared.close()
+            if mapped is not None:
+                mapped.close()
+    finally:
+        output.close()
+
+
+class ParallelDecoder:
+    """
+    Decodes large captures across a pool of worker processes.
+
+    Records are a fixed 16 bytes, so the input is split into record-aligned
+    shards that workers decode independently. Input bytes reach the workers
+    through shared memory, or through their own mmap of a capture file, and
+    each worker writes its rows straight into a shared output block; nothing
+    is pickled but the shard bounds. Results match decode_columns().
+
+    Workers are spawned on first use and decode with the parser registry as
+    it stands after importing parsers.py. If a worker dies (say it is
+    killed for running out of memory), the pool is replaced and the decode
+    tried once more on the new one.
+    """
+    def __init__(self, workers, min_bytes=PARALLEL_MIN_BYTES):
+        self.workers = workers
+        self.min_bytes = min_bytes
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def wants(self, nbytes):
+        """Whether an input of nbytes is large enough to be worth decoding in parallel."""
+        return self.workers > 1 and nbytes >= self.min_bytes
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn rather than fork: the server is multi-threaded, and it's the only option on Windows
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def close(self):
+        """Shuts down the worker pool; a later decode starts a new one."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def _discard(self, pool):
+        """Drops a broken pool so the next decode starts a fresh one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def decode(self, data):
+        """Decodes a bytes-like capture, sharing one copy of it with the workers."""
+        count = len(data) // RECORD_SIZE
+        shared = shared_memory.SharedMemory(create=True, size=max(count * RECORD_SIZE, 1))
+        try:
+            shared.buf[:count * RECORD_SIZE] = memoryview(data)[:count * RECORD_SIZE]
+            return self._decode(('shm', shared.name), count)
+        finally:
+            shared.close()
+            shared.unlink()
+
+    def decode_file(self, path, start, stop):
+        """Decodes bytes start..stop of a capture file that each worker maps itself."""
+        return self._decode(('file', path, start), (stop - start) // RECORD_SIZE)
+
+    def _decode(self, source, count):
+        output = shared_memory.SharedMemory(create=True, size=max(_output_nbytes(count), 1))
+        try:
+            n_shards = min(self.workers * SHARDS_PER_WORKER, max(count, 1))
+            bounds = np.linspace(0, count, n_shards + 1).astype(np.int64).tolist()
+            shards = [(first, last) for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+            for attempt in range(2):
+                pool = self._executor()
+                try:
+                    futures = [
+                        pool.submit(_decode_shard, source, count, output.name, first, last)
+                        for first, last in shards
+                    ]
+                    for future in futures:
+                        future.result()
+                    break
+                except BrokenProcessPool:
+                    self._discard(pool)
+                    if attempt:
+                        raise
+
+            out = _output_arrays(output.buf, count)
+            known = out['code'] >= 0
+            # Boolean indexing copies, so the results outlive the shared block
+            columns = {
+                'lat': out['lat'][known],
+                'lng': out['lng'][known],
+                'type': out['code'][known].astype(np.uint8),
+            }
+            del out, known
+            return columns
+        finally:
+            output.close()
+            output.unlink()
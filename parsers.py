@@ -1,32 +1,106 @@
-
 import struct
-from abc import ABC, abstractmethod
+from abc import ABC
+
+import numpy as np
+
+class Field:
+    """Describes one numeric field of a 16-byte record: byte offset, dtype and scale."""
+    def __init__(self, offset, dtype, scale=1):
+        self.offset = offset
+        self.dtype = np.dtype(dtype)
+        # Raw values are divided by the scale, e.g. 100000 for fixed-point degrees
+        self.scale = scale
+
+    def decode(self, buffer_view, row_indices):
+        """Decodes this field from the selected rows of an (N, 16) uint8 view as float64."""
+        end = self.offset + self.dtype.itemsize
+        raw = np.ascontiguousarray(buffer_view[row_indices, self.offset:end])
+        values = raw.view(self.dtype).reshape(-1)
+        # Signalling NaNs in corrupt float records would otherwise warn on the cast
+        with np.errstate(invalid='ignore'):
+            if self.scale != 1:
+                return values / float(self.scale)
+            return values.astype(np.float64)
 
 class SignalParser(ABC):
-    """Abstract base class for signal parsers."""
-    @abstractmethod
+    """
+    Base class for signal parsers.
+
+    A parser declares the sync word it handles, the label reported in the
+    'type' field and the record layout of its 'lat' and 'lng' fields. The
+    layout drives both the per-chunk parse() and the columnar parse_batch().
+    """
+    sync_word = None
+    type_label = None
+    layout = {}
+
     def parse(self, data_chunk):
         """Parses a 16-byte chunk and returns a dictionary of data."""
-        pass
+        if len(data_chunk) < 16:
+            raise struct.error(f"expected a 16-byte chunk, got {len(data_chunk)} bytes")
+        view = np.frombuffer(data_chunk, dtype=np.uint8, count=16).reshape(1, 16)
+        columns = self.parse_batch(view, np.zeros(1, dtype=np.intp))
+        return {'lat': columns['lat'].item(), 'lng': columns['lng'].item(), 'type': self.type_label}
+
+    def parse_batch(self, buffer_view, row_indices):
+        """Decodes the selected rows of an (N, 16) uint8 view into a dict of float64 arrays."""
+        return {name: field.decode(buffer_view, row_indices) for name, field in self.layout.items()}
+
+class ParserRegistry:
+    """Maps sync words to parser instances and assigns each a numeric type code."""
+    def __init__(self):
+        self.parsers = {}
+        # Bumped on every registration so cached decode results can be invalidated
+        self.version = 0
+        self._lookup = None
 
+    def register(self, parser_class):
+        """Class decorator that instantiates a parser and adds it to the registry."""
+        parser = parser_class()
+        if parser.sync_word in self.parsers:
+            raise ValueError(f"Sync word {hex(parser.sync_word)} is already registered")
+        self.parsers[parser.sync_word] = parser
+        self.version += 1
+        self._lookup = None
+        return parser_class
+
+    def get(self, sync_word):
+        return self.parsers.get(sync_word)
+
+    def labels(self):
+        """Type labels indexed by type code (registration order)."""
+        return [parser.type_label for parser in self.parsers.values()]
+
+    def lookup_table(self):
+        """A 65536-entry table mapping every sync word to its type code, or -1 if unknown."""
+        if self._lookup is None:
+            table = np.full(0x10000, -1, dtype=np.int16)
+            for code, sync_word in enumerate(self.parsers):
+                table[sync_word] = code
+            self._lookup = table
+        return self._lookup
+
+registry = ParserRegistry()
+register_parser = registry.register
+
+@register_parser
 class SignalAParser(SignalParser):
     """Parses Signal A type."""
-    def parse(self, data_chunk):
-        # Unpack as little-endian signed integers
-        lat_int = struct.unpack('<i', data_chunk[8:12])[0]
-        lon_int = struct.unpack('<i', data_chunk[12:16])[0]
-        
-        # Apply scaling factor
-        lat_float = lat_int / 100000.0
-        lon_float = lon_int / 100000.0
-        
-        return {'lat': lat_float, 'lng': lon_float, 'type': 'A'}
+    sync_word = 0x2020
+    type_label = 'A'
+    # Little-endian signed integers with a 1e5 fixed-point scale
+    layout = {
+        'lat': Field(8, '<i4', scale=100000),
+        'lng': Field(12, '<i4', scale=100000),
+    }
 
+@register_parser
 class SignalBParser(SignalParser):
     """Parses Signal B type."""
-    def parse(self, data_chunk):
-        # Unpack as big-endian floats
-        # Longitude is at bytes 6-9, Latitude is at bytes 10-13
-        lon_float, lat_float = struct.unpack('>ff', data_chunk[6:14])
-        
-        return {'lat': lat_float, 'lng': lon_float, 'type': 'B'}
+    sync_word = 0x2021
+    type_label = 'B'
+    # Big-endian floats, longitude at bytes 6-9 and latitude at bytes 10-13
+    layout = {
+        'lat': Field(10, '>f4'),
+        'lng': Field(6, '>f4'),
+    }
@@ -0,0 +1,82 @@
+import gzip
+import struct
+import zlib
+
+import numpy as np
+
+# Packed columnar alternative to the JSON list of point dicts, selected with
+# "Accept: application/vnd.geosignal.columns". All values are little-endian:
+#
+#   header      16 bytes  magic b'GSC1', version (u8), bytes per coordinate
+#                         (u8, 4 or 8), reserved (u16), point count (u32),
+#                         label block length (u32)
+#   labels      type labels joined by '\n' in UTF-8, NUL-padded to a multiple
+#               of 8 so the float columns stay aligned for typed arrays
+#   lat, lng    count floats each
+#   type        count uint8 indexes into the labels
+#   skipped     range count (u32), then (start, end) u64 byte-offset pairs,
+#               listing the ranges dropped by a resync decode
+COLUMNS_MIMETYPE = 'application/vnd.geosignal.columns'
+COLUMNS_MAGIC = b'GSC1'
+COLUMNS_VERSION = 1
+_HEADER = struct.Struct('<4sBBHII')
+
+# Responses smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 6
+
+
+def pack_columns(columns, labels, coord_dtype=np.float64, skipped=None):
+    """Serializes decoded columns into the packed binary payload described above."""
+    coord_dtype = np.dtype(coord_dtype).newbyteorder('<')
+    count = len(columns['lat'])
+    label_block = '\n'.join(labels).encode('utf-8')
+    padding = -len(label_block) % 8
+    skipped = skipped or []
+
+    parts = [
+        _HEADER.pack(COLUMNS_MAGIC, COLUMNS_VERSION, coord_dtype.itemsize, 0, count, len(label_block)),
+        label_block,
+        b'\0' * padding,
+        columns['lat'].astype(coord_dtype).tobytes(),
+        columns['lng'].astype(coord_dtype).tobytes(),
+        columns['type'].astype(np.uint8).tobytes(),
+        struct.pack('<I', len(skipped)),
+        np.asarray(skipped, dtype='<u8').tobytes(),
+    ]
+    return b''.join(parts)
+
+
+def unpack_columns(payload):
+    """Reads a packed payload back into (columns, labels, skipped)."""
+    magic, version, coord_bytes, _, count, label_length = _HEADER.unpack_from(payload)
+    if magic != COLUMNS_MAGIC or version != COLUMNS_VERSION:
+        raise ValueError("Not a packed columns payload")
+    coord_dtype = np.dtype(f'<f{coord_bytes}')
+    offset = _HEADER.size
+    labels = bytes(payload[offset:offset + label_length]).decode('utf-8').split('\n')
+    offset += label_length + (-label_length % 8)
+
+    columns = {}
+    for name in ('lat', 'lng'):
+        columns[name] = np.frombuffer(payload, dtype=coord_dtype, count=count, offset=offset)
+        offset += count * coord_bytes
+    columns['type'] = np.frombuffer(payload, dtype=np.uint8, count=count, offset=offset)
+    offset += count
+
+    skipped_count, = struct.unpack_from('<I', payload, offset)
+    spans = np.frombuffer(payload, dtype='<u8', count=2 * skipped_count, offset=offset + 4)
+    skipped = [tuple(span) for span in spans.reshape(-1, 2).tolist()]
+    return columns, labels, skipped
+
+
+def choose_encoding(accept_encodings):
+    """Picks gzip or deflate from a werkzeug Accept-Encoding header, or None."""
+    return accept_encodings.best_match(['gzip', 'deflate'])
+
+
+def compress_body(body, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(body, COMPRESS_LEVEL)
+    # HTTP "deflate" is the zlib-wrapped stream
+    return zlib.compress(body, COMPRESS_LEVEL)
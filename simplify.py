@@ -0,0 +1,106 @@
+import numpy as np
+
+from spatial import mercator_unit
+
+# Levels of detail are precomputed for map zooms 0 to LOD_MAX_ZOOM; beyond it
+# clients get every point
+LOD_MAX_ZOOM = 18
+# A point is dropped when it lies within this many screen pixels of the
+# simplified track at the requested zoom
+LOD_PIXEL_TOLERANCE = 0.5
+
+
+def zoom_tolerance(zoom):
+    """Simplification tolerance, in unit Web Mercator coordinates, for a map zoom."""
+    return LOD_PIXEL_TOLERANCE / (256.0 * 2.0 ** zoom)
+
+
+def _segment_distances(points, index, start, end):
+    """Distance of each points[index] to the segment points[start] -> points[end]."""
+    a = points[start]
+    ab = points[end] - a
+    ap = points[index] - a
+    length_sq = np.einsum('ij,ij->i', ab, ab)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.einsum('ij,ij->i', ap, ab) / length_sq
+    # Degenerate segments (closed loops) measure the distance to the endpoint
+    t = np.clip(np.nan_to_num(t, nan=0.0), 0.0, 1.0)
+    return np.linalg.norm(ap - t[:, None] * ab, axis=1)
+
+
+def douglas_peucker_significance(points, min_tolerance=0.0):
+    """
+    Per-point Douglas-Peucker significance of an (N, D) polyline.
+
+    A point is kept by Douglas-Peucker at tolerance t exactly when its
+    significance is greater than t, so every level of detail is one
+    comparison against this array. The endpoints are always kept (inf).
+    Splitting stops below min_tolerance; points under it get 0.
+
+    All segments at the same recursion depth are split together in one
+    vectorized step, so the Python loop runs once per depth, not per point.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    count = len(points)
+    significance = np.zeros(count)
+    if count == 0:
+        return significance
+    significance[[0, -1]] = np.inf
+
+    starts = np.array([0])
+    ends = np.array([count - 1])
+    parents = np.array([np.inf])
+    while True:
+        interior = ends - starts - 1
+        active = interior > 0
+        starts, ends, parents, interior = starts[active], ends[active], parents[active], interior[active]
+        if not len(starts):
+            break
+
+        # Flatten the interior points of every segment into one array
+        segment = np.repeat(np.arange(len(starts)), interior)
+        offsets = np.cumsum(interior) - interior
+        index = starts[segment] + 1 + np.arange(interior.sum()) - offsets[segment]
+        distance = _segment_distances(points, index, starts[segment], ends[segment])
+
+        # Farthest interior point of each segment (first one on ties)
+        farthest = np.maximum.reduceat(distance, offsets)
+        is_max = np.flatnonzero(distance == farthest[segment])
+        _, first = np.unique(segment[is_max], return_index=True)
+        split = index[is_max[first]]
+
+        keep = farthest > min_tolerance
+        starts, ends, split = starts[keep], ends[keep], split[keep]
+        # A point can never outlive the split that exposed it
+        level = np.minimum(farthest[keep], parents[keep])
+        significance[split] = level
+
+        starts, ends = np.concatenate((starts, split)), np.concatenate((split, ends))
+        parents = np.concatenate((level, level))
+
+    return significance
+
+
+def track_significance(columns):
+    """
+    Simplification significance of every point in a decoded dataset.
+
+    The points of each signal type form one track in record order, which is
+    simplified in Web Mercator coordinates. Points below the finest precomputed
+    level (LOD_MAX_ZOOM) get 0 and are only returned at full resolution.
+    """
+    x, y = mercator_unit(columns['lat'], columns['lng'])
+    significance = np.zeros(len(x))
+    finite = np.isfinite(x) & np.isfinite(y)
+    for code in np.unique(columns['type']):
+        rows = np.flatnonzero((columns['type'] == code) & finite)
+        track = np.column_stack((x[rows], y[rows]))
+        significance[rows] = douglas_peucker_significance(track, zoom_tolerance(LOD_MAX_ZOOM))
+    return significance
+
+
+def lod_mask(significance, zoom):
+    """Rows to keep for a map zoom; past LOD_MAX_ZOOM every row is kept."""
+    if zoom > LOD_MAX_ZOOM:
+        return np.ones(len(significance), dtype=bool)
+    return significance > zoom_tolerance(zoom)
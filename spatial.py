@@ -0,0 +1,218 @@
+import numpy as np
+
+# Points are indexed by the Morton (Z-order) code of their Web Mercator tile
+# coordinates at INDEX_ZOOM. Sorting by that code puts every map tile, at any
+# coarser zoom, into one contiguous range of the index.
+INDEX_ZOOM = 24
+MAX_MERCATOR_LAT = 85.0511287798
+
+# Clusters are grid cells this many zoom levels finer than the map tiles, so a
+# 256px tile is split into 4x4 cells of 64px
+CLUSTER_CELL_BITS = 2
+# Point tiles keep at most one point per type per pixel of a 256px tile
+PIXEL_BITS = 8
+# A cluster query looks up at most this many Morton ranges, covering the bbox
+# with coarser tiles when it spans more
+MAX_RANGE_TILES = 256
+
+
+def mercator_unit(lat, lng):
+    """Web Mercator coordinates of each point scaled to the unit square, y pointing south."""
+    lat = np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)
+    lat_rad = np.deg2rad(lat)
+    x = (np.asarray(lng) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0
+    return x, y
+
+
+def mercator_xy(lat, lng, zoom=INDEX_ZOOM):
+    """Integer Web Mercator tile coordinates of each point at the given zoom."""
+    scale = 2.0 ** zoom
+    x, y = mercator_unit(lat, lng)
+    limit = scale - 1
+    return (np.clip(x * scale, 0, limit).astype(np.uint64),
+            np.clip(y * scale, 0, limit).astype(np.uint64))
+
+
+def _spread_bits(v):
+    # Inserts a zero bit between each of the low 32 bits of v
+    v = v & np.uint64(0x00000000FFFFFFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def _compact_bits(v):
+    # Inverse of _spread_bits: gathers every other bit back into the low 32
+    v = v & np.uint64(0x5555555555555555)
+    v = (v | (v >> np.uint64(1))) & np.uint64(0x3333333333333333)
+    v = (v | (v >> np.uint64(2))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v >> np.uint64(4))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v >> np.uint64(8))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v >> np.uint64(16))) & np.uint64(0x00000000FFFFFFFF)
+    return v
+
+
+def morton_codes(x, y):
+    return _spread_bits(x) | (_spread_bits(y) << np.uint64(1))
+
+
+def morton_xy(codes):
+    return _compact_bits(codes), _compact_bits(codes >> np.uint64(1))
+
+
+def cluster_level(zoom):
+    """Grid level whose cells are the clusters at a map zoom."""
+    return min(zoom + CLUSTER_CELL_BITS, INDEX_ZOOM)
+
+
+def grid_nbytes(grid):
+    return sum(array.nbytes for array in grid.values())
+
+
+class SpatialIndex:
+    """
+    Morton-sorted index over one decoded dataset.
+
+    Built once per dataset. A map tile at any zoom is located with two binary
+    searches. Per-zoom cluster grids are aggregated by grid() and kept by the
+    caller, so they can be cached and accounted for separately.
+    """
+    def __init__(self, columns, n_types):
+        lat = columns['lat']
+        lng = columns['lng']
+        with np.errstate(invalid='ignore'):
+            valid = np.isfinite(lat) & np.isfinite(lng) & (np.abs(lat) <= 90) & (np.abs(lng) <= 180)
+        rows = np.flatnonzero(valid)
+        x, y = mercator_xy(lat[rows], lng[rows])
+        codes = morton_codes(x, y)
+        order = np.argsort(codes, kind='stable')
+
+        self.n_types = n_types
+        self.codes = codes[order]
+        # Row of each indexed point in the original columns, in Morton order
+        self.rows = rows[order]
+        self.lat = lat[self.rows]
+        self.lng = lng[self.rows]
+        self.type = columns['type'][self.rows]
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.codes, self.rows, self.lat, self.lng, self.type))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def tile_range(self, zoom, x, y):
+        """Returns (start, stop) positions of the points inside tile z/x/y."""
+        shift = np.uint64(2 * (INDEX_ZOOM - zoom))
+        prefix = morton_codes(np.uint64(x), np.uint64(y))
+        low = prefix << shift
+        high = (prefix + np.uint64(1)) << shift
+        start, stop = np.searchsorted(self.codes, [low, high])
+        return int(start), int(stop)
+
+    def tile_points(self, zoom, x, y, types=None):
+        """
+        Returns index positions of the points to draw in tile z/x/y.
+
+        Points are decimated to one per type per tile pixel, so a tile never
+        holds more than 256 * 256 points per type however dense the data is.
+        """
+        start, stop = self.tile_range(zoom, x, y)
+        positions = np.arange(start, stop)
+        if types is not None:
+            positions = positions[np.isin(self.type[start:stop], types)]
+
+        pixel_level = min(zoom + PIXEL_BITS, INDEX_ZOOM)
+        pixels = self.codes[positions] >> np.uint64(2 * (INDEX_ZOOM - pixel_level))
+        keys = pixels * np.uint64(self.n_types) + self.type[positions]
+        _, first = np.unique(keys, return_index=True)
+        return positions[np.sort(first)]
+
+    def grid(self, level):
+        """
+        Aggregates points into the cells of the tile grid at the given level.
+
+        Returns a dict of per-cell arrays in Morton order: the cell's Morton
+        code at that level in 'cells', cell 'x' and 'y', and per-type 'count',
+        'lat_sum' and 'lng_sum' of shape (cells, n_types).
+        """
+        cells = self.codes >> np.uint64(2 * (INDEX_ZOOM - level))
+        boundaries = np.flatnonzero(cells[1:] != cells[:-1]) + 1
+        starts = np.concatenate(([0], boundaries)) if len(cells) else boundaries
+        cell_ids = np.zeros(len(cells), dtype=np.intp)
+        cell_ids[boundaries] = 1
+        np.cumsum(cell_ids, out=cell_ids)
+
+        # One bincount per statistic over (cell, type) pairs
+        bins = cell_ids * self.n_types + self.type
+        size = len(starts) * self.n_types
+        shape = (len(starts), self.n_types)
+        x, y = morton_xy(cells[starts])
+        return {
+            'cells': cells[starts],
+            'x': x,
+            'y': y,
+            'count': np.bincount(bins, minlength=size).reshape(shape),
+            'lat_sum': np.bincount(bins, weights=self.lat, minlength=size).reshape(shape),
+            'lng_sum': np.bincount(bins, weights=self.lng, minlength=size).reshape(shape),
+        }
+
+    def clusters(self, bbox, zoom, types=None, grid=None):
+        """
+        Returns the clusters inside bbox (west, south, east, north) at a map zoom.
+
+        Each cluster is a dict with the centroid 'lat'/'lng', the total
+        'count' and per-type counts in 'types' (indexed by type code). Only
+        the type codes in types are counted when it is given. grid is the
+        grid at cluster_level(zoom), built here if not passed in. Only the
+        cells of the tiles covering the bbox are looked at, so the cost
+        depends on the viewport rather than on the whole dataset.
+        """
+        level = cluster_level(zoom)
+        if grid is None:
+            grid = self.grid(level)
+
+        west, south, east, north = bbox
+        x_min, y_min = mercator_xy(np.array([north]), np.array([max(west, -180.0)]), level)
+        x_max, y_max = mercator_xy(np.array([south]), np.array([min(east, 180.0)]), level)
+        x_min, y_min, x_max, y_max = int(x_min[0]), int(y_min[0]), int(x_max[0]), int(y_max[0])
+
+        # Cover the bbox with tiles coarse enough to keep the number of ranges bounded
+        shift = min(CLUSTER_CELL_BITS, level)
+        while ((x_max >> shift) - (x_min >> shift) + 1) * ((y_max >> shift) - (y_min >> shift) + 1) > MAX_RANGE_TILES:
+            shift += 1
+        tile_x, tile_y = np.meshgrid(
+            np.arange(x_min >> shift, (x_max >> shift) + 1, dtype=np.uint64),
+            np.arange(y_min >> shift, (y_max >> shift) + 1, dtype=np.uint64))
+        prefixes = morton_codes(tile_x.ravel(), tile_y.ravel())
+        prefix_shift = np.uint64(2 * shift)
+        starts = np.searchsorted(grid['cells'], prefixes << prefix_shift)
+        stops = np.searchsorted(grid['cells'], (prefixes + np.uint64(1)) << prefix_shift)
+        lengths = stops - starts
+        positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+
+        x = grid['x'][positions]
+        y = grid['y'][positions]
+        positions = positions[(x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)]
+
+        selected = np.arange(self.n_types) if types is None else np.asarray(types, dtype=np.intp)
+        counts = grid['count'][positions][:, selected]
+        totals = counts.sum(axis=1)
+        keep = totals > 0
+        totals = totals[keep]
+        counts = counts[keep]
+        lat = grid['lat_sum'][positions][:, selected].sum(axis=1)[keep] / totals
+        lng = grid['lng_sum'][positions][:, selected].sum(axis=1)[keep] / totals
+
+        full_counts = np.zeros((len(totals), self.n_types), dtype=counts.dtype)
+        full_counts[:, selected] = counts
+        return [
+            {'lat': cluster_lat, 'lng': cluster_lng, 'count': count, 'types': type_counts}
+            for cluster_lat, cluster_lng, count, type_counts in zip(
+                lat.tolist(), lng.tolist(), totals.tolist(), full_counts.tolist())
+        ]
@@ -0,0 +1,138 @@
+"""
+Map tile storage in a single MBTiles (SQLite) file.
+
+An offline tile tree of millions of small PNGs can be packed into one file
+with:
+
+    python tiles.py frontend/tiles tiles.mbtiles
+
+and served by pointing GEOSIGNAL_MBTILES at it.
+"""
+import hashlib
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from cache import LRUCache
+
+MIMETYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+    'pbf': 'application/x-protobuf',
+}
+
+
+def tile_etag(body):
+    """Strong ETag value for a tile body."""
+    return hashlib.sha1(body).hexdigest()
+
+
+class MBTilesReader:
+    """
+    Read-only access to an MBTiles file, shared by request threads.
+
+    Connections are opened lazily, up to pool_size, and handed out one per
+    lookup. Tiles are addressed in XYZ order; MBTiles stores rows in TMS
+    order, so y is flipped on the way in. Hot tiles and their ETags are kept
+    in an LRU cache, misses included, so panning over the same area doesn't
+    touch SQLite again.
+    """
+    def __init__(self, path, pool_size=8, cache_bytes=64 * 1024 * 1024):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"MBTiles file not found: {path}")
+        self.path = path
+        self.pool_size = pool_size
+        self.cache = LRUCache(cache_bytes)
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        with self._connection() as connection:
+            metadata = dict(connection.execute('SELECT name, value FROM metadata').fetchall())
+        self.format = metadata.get('format', 'png').lower()
+        self.mimetype = MIMETYPES.get(self.format, 'application/octet-stream')
+
+    def _connect(self):
+        # immutable: the file is never written while served, so SQLite can skip locking
+        uri = f'file:{os.path.abspath(self.path)}?mode=ro&immutable=1'
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    @contextmanager
+    def _connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.pool_size
+                if can_open:
+                    self._opened += 1
+            # Past the pool size, wait for another thread to hand one back
+            connection = self._connect() if can_open else self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def get(self, z, x, y):
+        """Returns (body, etag) for tile z/x/y, or (None, None) if the file doesn't have it."""
+        key = (z, x, y)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+        with self._connection() as connection:
+            row = connection.execute(
+                'SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+                (z, x, (1 << z) - 1 - y),
+            ).fetchone()
+        entry = (bytes(row[0]), tile_etag(row[0])) if row else (None, None)
+        self.cache.put(key, entry, (len(entry[0]) if entry[0] else 0) + 64)
+        return entry
+
+
+def pack_directory(tile_root, path, name=None):
+    """Packs a z/x/y.<ext> tile tree into a new MBTiles file. Returns the number of tiles."""
+    connection = sqlite3.connect(path)
+    count = 0
+    tile_format = None
+    try:
+        connection.executescript(
+            'CREATE TABLE metadata (name TEXT PRIMARY KEY, value TEXT);'
+            'CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB,'
+            ' PRIMARY KEY (zoom_level, tile_column, tile_row)) WITHOUT ROWID;'
+        )
+        for z_name in sorted(os.listdir(tile_root)):
+            if not z_name.isdigit():
+                continue
+            z = int(z_name)
+            for x_name in os.listdir(os.path.join(tile_root, z_name)):
+                if not x_name.isdigit():
+                    continue
+                x_dir = os.path.join(tile_root, z_name, x_name)
+                rows = []
+                for file_name in os.listdir(x_dir):
+                    y_name, _, ext = file_name.partition('.')
+                    if not y_name.isdigit() or ext.lower() not in MIMETYPES:
+                        continue
+                    tile_format = tile_format or ext.lower()
+                    with open(os.path.join(x_dir, file_name), 'rb') as f:
+                        rows.append((z, int(x_name), (1 << z) - 1 - int(y_name), f.read()))
+                connection.executemany('INSERT INTO tiles VALUES (?, ?, ?, ?)', rows)
+                count += len(rows)
+        connection.executemany('INSERT INTO metadata VALUES (?, ?)', [
+            ('name', name or os.path.basename(os.path.normpath(tile_root))),
+            ('format', tile_format or 'png'),
+        ])
+        connection.commit()
+    finally:
+        connection.close()
+    return count
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: python tiles.py <tile directory> <output.mbtiles>')
+    print(f"Packed {pack_directory(sys.argv[1], sys.argv[2])} tiles into {sys.argv[2]}")
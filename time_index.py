@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+
+class TimeIndex:
+    """
+    Sorted index over one epoch-seconds time column of a dataset.
+
+    Built once per (dataset, column), it answers the dashboard's date range
+    filters with two binary searches. Timestamps that fail to parse are left
+    out, as pd.to_datetime(errors="coerce") would make them NaT. When the
+    column is already in time order the matching rows are a plain slice, so
+    filtering doesn't copy any data.
+    """
+    def __init__(self, column):
+        times = pd.to_datetime(column, unit="s", errors="coerce")
+        stamps = times.to_numpy(dtype="datetime64[ns]")
+        valid = ~np.isnat(stamps)
+        values = stamps.view(np.int64)
+        self.is_sorted = bool(valid.all()) and bool(np.all(values[1:] >= values[:-1]))
+        if self.is_sorted:
+            self.order = None
+            self.times = values
+        else:
+            rows = np.flatnonzero(valid)
+            self.order = rows[np.argsort(values[rows], kind="stable")]
+            self.times = values[self.order]
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + (self.order.nbytes if self.order is not None else 0)
+
+    def __len__(self):
+        return len(self.times)
+
+    def bounds(self):
+        """The first and last dates in the column, or (None, None) if it has no valid times."""
+        if not len(self.times):
+            return None, None
+        first, last = pd.to_datetime(self.times[[0, -1]])
+        return first.date(), last.date()
+
+    def positions(self, start_date, end_date):
+        """(lo, hi) bounds of the inclusive date range within the sorted times."""
+        start = pd.Timestamp(pd.to_datetime(start_date).date())
+        stop = pd.Timestamp(pd.to_datetime(end_date).date() + timedelta(days=1))
+        lo, hi = np.searchsorted(self.times, [start.value, stop.value], side="left")
+        return int(lo), int(hi)
+
+    def rows(self, start_date, end_date):
+        """
+        Rows whose date falls between start_date and end_date inclusive, in row order.
+
+        Returns a slice when the column is sorted and an array of row
+        positions otherwise; either can be passed to DataFrame.iloc.
+        """
+        lo, hi = self.positions(start_date, end_date)
+        if self.order is None:
+            return slice(lo, hi)
+        return np.sort(self.order[lo:hi])